@@ -0,0 +1,88 @@
+import copy
+import inspect
+import itertools
+import numpy as np
+import pytest
+from эipdai import IPDGame
+from эipdai.strategies import baselines, Strategy, GeneticStrategy, compile_strategy
+from эipdai.tournament import play_game
+from эipdai.evolution import play_population_games
+
+N_ROUNDS = 20
+
+BASELINES = [
+    cls for _, cls in inspect.getmembers(baselines, inspect.isclass)
+    if issubclass(cls, Strategy) and cls.__module__ == baselines.__name__
+]
+DETERMINISTIC = [cls for cls in BASELINES if cls.deterministic]
+
+def play(environment, players, seeds):
+    for player, seed in zip(players, seeds):
+        player.seed(seed)
+    return play_game(environment, players, {'n_rounds': N_ROUNDS}, per_round=True)
+
+@pytest.mark.parametrize('cls', DETERMINISTIC, ids=lambda cls: cls.__name__)
+def test_automaton_plays_like_original(cls):
+    environment = IPDGame(min_rounds=N_ROUNDS, max_rounds=N_ROUNDS)
+    automaton = compile_strategy(cls(), max_rounds=N_ROUNDS)
+    opponents = [opponent_cls() for opponent_cls in BASELINES]
+
+    for (i, first), (j, second) in itertools.permutations(enumerate(opponents), 2):
+        for seat in range(3):
+            rewards = []
+            for player in [cls(), automaton]:
+                players = [first, second]
+                players.insert(seat, player)
+                seeds = [i, j]
+                seeds.insert(seat, None)
+                rewards.append(play(environment, players, seeds))
+
+            assert np.array_equal(*rewards), (first.name, second.name, seat)
+
+@pytest.mark.parametrize('memory_len', [1, 2, 3])
+def test_population_games_match_serial_games(memory_len):
+    rng = np.random.default_rng(memory_len)
+    environment = IPDGame(min_rounds=10, max_rounds=N_ROUNDS)
+    opponents = [cls() for cls in BASELINES]
+
+    genotype_len = sum(8**i for i in range(memory_len + 1))
+    genotypes = rng.integers(0, 2, [6, genotype_len])
+    individuals = np.repeat(np.arange(len(genotypes)), 20)
+    rosters = np.array([rng.choice(len(opponents), 2, replace=False) for _ in individuals])
+    end_rounds = rng.integers(environment.min_rounds, environment.max_rounds + 1, len(individuals))
+    opponent_seeds = rng.integers(1 << 31, size=[len(individuals), 2])
+
+    returns = play_population_games(
+        genotypes, memory_len, opponents, environment, individuals, rosters, end_rounds, opponent_seeds
+    )
+
+    for g, (individual, roster) in enumerate(zip(individuals, rosters)):
+        players = [GeneticStrategy(memory_len, genotype=genotypes[individual].tolist())]
+        players += [copy.copy(opponents[i]) for i in roster]
+        for player, seed in zip(players[1:], opponent_seeds[g]):
+            player.seed(int(seed))
+
+        expected = play_game(environment, players, {'n_rounds': int(end_rounds[g])})[0]
+        assert returns[g] == expected, (g, [player.name for player in players])
+
+@pytest.mark.parametrize('memory_len', [1, 2, 3, 4])
+def test_genetic_automaton_plays_like_genotype(memory_len):
+    rng = np.random.default_rng(memory_len)
+    environment = IPDGame(min_rounds=N_ROUNDS, max_rounds=N_ROUNDS)
+    genotype = rng.integers(0, 2, sum(8**i for i in range(memory_len + 1))).tolist()
+    automaton = compile_strategy(GeneticStrategy(memory_len, genotype=genotype), max_rounds=N_ROUNDS)
+    opponents = [opponent_cls() for opponent_cls in BASELINES]
+
+    assert automaton.n_states == len(genotype)
+
+    for (i, first), (j, second) in itertools.permutations(enumerate(opponents), 2):
+        rewards = [
+            play(environment, [player, first, second], [None, i, j])
+            for player in [GeneticStrategy(memory_len, genotype=genotype), automaton]
+        ]
+
+        assert np.array_equal(*rewards), (first.name, second.name)
+
+def test_genetic_automaton_respects_max_states():
+    with pytest.raises(ValueError):
+        compile_strategy(GeneticStrategy(2), max_states=50)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from эipdai import IPDGame, BatchIPDGame
+from эipdai.strategies import AverageCopier, SoftTullock, ToughTullock, Random
+
+@pytest.mark.parametrize('cls', [AverageCopier, SoftTullock, ToughTullock])
+def test_plain_array_observations_play_like_observations_with_statistics(cls):
+    environment = IPDGame(min_rounds=40, max_rounds=40)
+    players = {name: cls() for name in ['statistics', 'array', 'copy']}
+    opponents = [Random(), Random()]
+
+    for seed, player in enumerate(list(players.values()) + opponents):
+        player.seed(seed)
+        player.reset()
+    for player in players.values():
+        player.seed(0)
+
+    observations = environment.reset_array(seed=0)
+    done = False
+    while not done:
+        actions = {
+            'statistics': players['statistics'].play(observations[0]),
+            'array': players['array'].play(np.asarray(observations[0])),
+            'copy': players['copy'].play(observations[0].copy())
+        }
+        assert len(set(actions.values())) == 1, actions
+
+        moves = [actions['statistics']] + [opponent.play(observations[i]) for i, opponent in enumerate(opponents, 1)]
+        observations, rewards, done = environment.step_array(moves)
+
+@pytest.mark.parametrize('cls', [AverageCopier, SoftTullock, ToughTullock])
+def test_batch_observations_without_statistics(cls):
+    batch = BatchIPDGame(min_rounds=20, max_rounds=20, n_games=2, statistics=False)
+    observations = batch.reset()
+    player = cls()
+    player.reset()
+
+    for _ in range(20):
+        player.play(observations[0][0])
+        observations, rewards, done = batch.step(np.zeros([2, 3], dtype=int))
@@ -0,0 +1,32 @@
+import itertools
+import numpy as np
+import pytest
+from эipdai.dynamics import moran_fitness
+
+def brute_force_fitness(tensor: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    '''
+    Mean return of the first individual of every strategy over all ordered pairs of distinct other individuals.
+    '''
+    individuals = np.repeat(np.arange(len(counts)), counts)
+
+    fitness = np.full(len(counts), np.nan)
+    for i in np.flatnonzero(counts):
+        focal = np.flatnonzero(individuals == i)[0]
+        others = np.delete(individuals, focal)
+        fitness[i] = np.mean([tensor[i, j, k] for j, k in itertools.permutations(others, 2)])
+
+    return fitness
+
+@pytest.mark.parametrize('seed', range(5))
+def test_moran_fitness_matches_enumeration(seed):
+    rng = np.random.default_rng(seed)
+    n_strategies = 4
+    tensor = rng.uniform(0, 100, [n_strategies] * 3)
+    counts = rng.integers(0, 4, [6, n_strategies])
+    counts[:, 0] += 3 - np.minimum(counts.sum(axis=1), 3)
+
+    fitness = moran_fitness(tensor, counts)
+
+    for run in range(len(counts)):
+        present = counts[run] > 0
+        assert np.allclose(fitness[run, present], brute_force_fitness(tensor, counts[run])[present])
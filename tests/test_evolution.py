@@ -0,0 +1,129 @@
+import random
+import numpy as np
+import pytest
+from эipdai import IPDGame
+from эipdai.strategies import SoftT4T, Naive, Defector, Random, SoftGrudger
+from эipdai.evolution import (
+    evaluate_population_racing, schedule_population_games, get_population_fitness_func, FitnessCache, GeneticAlgorithm
+)
+
+@pytest.mark.parametrize('budgets', [(), (0, 2), (2, 2, 6), (1, 6, 2)])
+def test_racing_rejects_invalid_budgets(budgets):
+    genotypes = np.zeros([10, 9], dtype=np.uint8)
+    with pytest.raises(ValueError):
+        evaluate_population_racing(genotypes, 1, [SoftT4T(), Naive(), Defector()], IPDGame(5, 10), budgets=budgets)
+
+def opponent_pool():
+    return [SoftT4T(), Naive(), Defector(), Random(), SoftGrudger()]
+
+@pytest.mark.parametrize('common_random_numbers', [False, True])
+def test_seeded_genetic_algorithm_runs_repeat(common_random_numbers):
+    runs = []
+    for global_seed in range(2):
+        np.random.seed(global_seed)
+        random.seed(global_seed)
+        ga = GeneticAlgorithm(
+            1, opponent_pool(), IPDGame(5, 20), pop_size=20, common_random_numbers=common_random_numbers, seed=3
+        )
+        ga.run(3)
+        runs.append((ga.population, ga.best_solutions_fitness))
+
+    assert np.array_equal(runs[0][0], runs[1][0])
+    assert runs[0][1] == runs[1][1]
+
+def test_schedules_without_common_random_numbers_differ_per_candidate():
+    environment = IPDGame(1, 1000)
+    individuals, rosters, end_rounds, opponent_seeds = schedule_population_games(
+        np.arange(4), 2, 5, environment, np.random.default_rng(0), common_random_numbers=False
+    )
+
+    assert len(individuals) == len(rosters) == len(end_rounds) == len(opponent_seeds) == 4 * 2 * 3
+    assert len(set(end_rounds.reshape(4, -1)[:, 0])) == 4
+
+class CountingFitness:
+    '''
+    Fitness of the number of ones of genotypes plus the number of evaluations so far, records evaluated batches.
+    '''
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, population):
+        self.batches.append(population.copy())
+        return population.sum(axis=1) + len(self.batches)
+
+def test_fitness_cache_hits_misses_and_eviction():
+    fitness_func = CountingFitness()
+    cache = FitnessCache(1, opponent_pool(), IPDGame(5, 10), maxsize=2, fitness_func=fitness_func)
+    a, b, c = np.eye(3, 9, dtype=np.uint8)
+
+    assert np.array_equal(cache(np.array([a, b, a])), [2, 2, 2])
+    assert (cache.hits, cache.misses, len(cache)) == (1, 2, 2)
+    assert len(fitness_func.batches[0]) == 2
+
+    # a is used more recently than b, so c evicts b
+    assert np.array_equal(cache(np.array([c, a])), [3, 2])
+    assert (cache.hits, cache.misses, len(cache)) == (2, 3, 2)
+
+    assert np.array_equal(cache(np.array([b])), [4])
+    assert len(fitness_func.batches) == 3
+
+def test_fitness_cache_averages_samples():
+    fitness_func = CountingFitness()
+    cache = FitnessCache(1, opponent_pool(), IPDGame(5, 10), n_samples=2, fitness_func=fitness_func)
+    a = np.ones([1, 9], dtype=np.uint8)
+
+    assert np.array_equal(cache(a), [10])
+    assert np.array_equal(cache(a), [10.5])
+    assert np.array_equal(cache(a), [10.5])
+    assert len(fitness_func.batches) == 2
+
+def test_fitness_cache_keys_depend_on_context():
+    genotype = np.ones(9, dtype=np.uint8)
+    keys = {
+        FitnessCache(1, opponent_pool(), IPDGame(5, 10)).key(genotype),
+        FitnessCache(1, opponent_pool()[:3], IPDGame(5, 10)).key(genotype),
+        FitnessCache(1, opponent_pool(), IPDGame(5, 20)).key(genotype)
+    }
+
+    assert len(keys) == 3
+
+@pytest.mark.parametrize('common_random_numbers', [False, True])
+def test_seeded_pygad_fitness_func_repeats(common_random_numbers):
+    pygad = pytest.importorskip('pygad')
+    runs = []
+    for global_seed in range(2):
+        np.random.seed(global_seed)
+        random.seed(global_seed)
+        ga = pygad.GA(
+            num_generations=3,
+            initial_population=np.random.default_rng(0).integers(0, 2, [20, 9]),
+            fitness_func=get_population_fitness_func(
+                IPDGame(5, 20), opponent_pool(), 1, common_random_numbers=common_random_numbers, seed=3
+            ),
+            fitness_batch_size=10,
+            num_parents_mating=5,
+            parent_selection_type='rank',
+            crossover_type='uniform',
+            mutation_probability=0.1,
+            gene_space={'low': 0, 'high': 1},
+            gene_type=int,
+            random_seed=0,
+            suppress_warnings=True
+        )
+        ga.run()
+        runs.append(ga.best_solutions_fitness)
+
+    assert runs[0] == runs[1]
+
+def test_pygad_fitness_func_shares_games_within_generations():
+    class Instance:
+        generations_completed = 0
+
+    population = np.random.default_rng(0).integers(0, 2, [6, 9])
+    population[3] = population[0]
+    fitness_func = get_population_fitness_func(IPDGame(5, 30), opponent_pool(), 1, common_random_numbers=True)
+
+    fitness = fitness_func(Instance(), population, np.arange(6))
+
+    assert fitness[0] == fitness[3]
+    assert np.array_equal(fitness_func(Instance(), population, np.arange(6)), fitness)
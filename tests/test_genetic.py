@@ -0,0 +1,97 @@
+import copy
+import numpy as np
+import pytest
+from эipdai import IPDGame
+from эipdai.common import N_OUTCOMES, N_PLAYERS
+from эipdai.strategies import GeneticStrategy, Naive, canonical_index_map, from_canonical, to_canonical
+from эipdai.tournament import play_game, run_tournament
+
+def masked_gene_index(observation: np.ndarray, memory_len: int) -> int:
+    '''
+    Gene index as computed by the original masked array implementation of GeneticStrategy.play.
+    '''
+    outcomes_coef = np.array([N_OUTCOMES**i for i in range(memory_len - 1, -1, -1)])
+    moves_coef = np.array([2**i for i in range(N_PLAYERS)])
+
+    obs_trimmed = np.asarray(observation)[:, -memory_len:]
+    obs_masked = np.ma.masked_array(obs_trimmed, obs_trimmed < 0)
+
+    no_history_offset = ((obs_masked >= 0).any(axis=0) * outcomes_coef).sum()
+
+    gene_idx = ((obs_masked * moves_coef[:, None]).sum(axis=0) * outcomes_coef).sum() + no_history_offset
+    if type(gene_idx) is np.ma.core.MaskedConstant:
+        gene_idx = 0
+
+    return int(gene_idx)
+
+@pytest.mark.parametrize('memory_len', [1, 2, 3, 4])
+def test_gene_index_matches_masked_computation(memory_len):
+    rng = np.random.default_rng(memory_len)
+    environment = IPDGame(min_rounds=40, max_rounds=40)
+
+    for _ in range(20):
+        # Random genotypes make the strategy's own moves random too
+        genotype_len = sum(N_OUTCOMES**i for i in range(memory_len + 1))
+        player = GeneticStrategy(memory_len, genotype=rng.integers(0, 2, genotype_len).tolist())
+        player.reset()
+        observations = environment.reset_array(seed=int(rng.integers(1 << 31)))
+
+        done = False
+        while not done:
+            action = player.play(observations[0])
+            assert player.state() == masked_gene_index(observations[0], memory_len)
+            assert action == player.genotype[player.state()]
+
+            actions = [action] + rng.integers(0, 2, N_PLAYERS - 1).tolist()
+            observations, rewards, done = environment.step_array(actions)
+
+def test_player_seated_twice_plays_both_seats_independently():
+    environment = IPDGame(min_rounds=30, max_rounds=30)
+    rng = np.random.default_rng(1)
+    genotype_len = len(GeneticStrategy(2, canonical=True).genotype)
+    # Canonical genotypes treat both opponents alike, so both seat orders score the same
+    player = GeneticStrategy(2, genotype=rng.integers(0, 2, genotype_len).tolist(), name='G', canonical=True)
+    players = [player, Naive()]
+
+    expected = play_game(environment, [player, copy.copy(player), Naive()])[0]
+    results = run_tournament(environment, players, n_runs=3, seed=0)
+
+    assert results['G'] == expected
+
+def test_play_without_reset():
+    player = GeneticStrategy(1, genotype=[1] + [0] * N_OUTCOMES)
+
+    assert player.play(np.full([N_PLAYERS, 5], -1)) == 1
+
+def swap_opponents(observation: np.ndarray) -> np.ndarray:
+    return np.asarray(observation)[[0, 2, 1]]
+
+@pytest.mark.parametrize('memory_len', [1, 2, 3])
+def test_canonical_round_trip(memory_len):
+    rng = np.random.default_rng(memory_len)
+    genotype_len = sum(N_OUTCOMES**i for i in range(memory_len + 1))
+    index_map = canonical_index_map(memory_len)
+    canonical = rng.integers(0, 2, [4, index_map.max() + 1])
+
+    full = from_canonical(canonical, memory_len)
+
+    assert full.shape == (4, genotype_len)
+    assert np.array_equal(to_canonical(full, memory_len), canonical)
+    assert np.array_equal(from_canonical(to_canonical(full, memory_len), memory_len), full)
+
+@pytest.mark.parametrize('memory_len', [1, 2, 3])
+def test_canonical_strategies_treat_opponents_alike(memory_len):
+    rng = np.random.default_rng(memory_len)
+    genotype_len = len(to_canonical(np.zeros(sum(N_OUTCOMES**i for i in range(memory_len + 1))), memory_len))
+
+    for _ in range(5):
+        genotype = rng.integers(0, 2, genotype_len).tolist()
+        players = [GeneticStrategy(memory_len, genotype, canonical=True) for _ in range(2)]
+        for player in players:
+            player.reset()
+
+        history = np.full([N_PLAYERS, 20], -1)
+        for t in range(20):
+            action = players[0].play(history)
+            assert players[1].play(swap_opponents(history)) == action
+            history = np.concatenate([history[:, 1:], [[action], rng.integers(0, 2, 1), rng.integers(0, 2, 1)]], axis=1)
@@ -0,0 +1,29 @@
+import numpy as np
+from эipdai import IPDGame
+from эipdai.strategies import SoftT4T, Naive, Defector, Random, Joss
+from эipdai.islands import IslandModel
+
+def island_model(**kwargs):
+    opponents = [SoftT4T(), Naive(), Defector(), Random(), Joss()]
+    return IslandModel(
+        1, opponents, IPDGame(5, 20), n_islands=3, pop_size=12, migration_interval=2, seed=7, **kwargs
+    )
+
+def test_workers_and_resumed_runs_repeat_serial_runs(tmp_path):
+    serial = island_model()
+    serial.run(6)
+
+    parallel = island_model(n_workers=2)
+    parallel.run(6)
+
+    checkpoint = str(tmp_path / 'islands.npz')
+    interrupted = island_model(n_workers=2)
+    interrupted.run(4, checkpoint_path=checkpoint)
+    resumed = island_model()
+    resumed.load(checkpoint)
+    resumed.run(2)
+
+    for model in [parallel, resumed]:
+        assert np.array_equal(model.best_solutions_fitness, serial.best_solutions_fitness)
+        for island, serial_island in zip(model.islands, serial.islands):
+            assert np.array_equal(island.population, serial_island.population)
@@ -0,0 +1,44 @@
+import itertools
+import numpy as np
+from эipdai import IPDGame
+from эipdai.strategies import GeneticStrategy, SoftT4T, FairT4T, Random
+from эipdai.tournament import expected_returns, seat_players
+from эipdai.payoffs import PayoffStore, payoff_tensor
+
+def genetic_pool():
+    rng = np.random.default_rng(0)
+    return [
+        GeneticStrategy(2, genotype=rng.integers(0, 2, 73).tolist(), name='G1'),
+        GeneticStrategy(2, genotype=rng.integers(0, 2, 73).tolist(), name='G2'),
+        SoftT4T(),
+        FairT4T()
+    ]
+
+def test_payoff_tensor_matches_every_seating():
+    environment = IPDGame(min_rounds=50, max_rounds=60)
+    players = genetic_pool()
+
+    tensor = payoff_tensor(environment, players, n_runs=1)
+
+    for roster in itertools.product(range(len(players)), repeat=3):
+        expected = expected_returns(environment, seat_players(players, list(roster)), 1)[0]
+        assert np.isclose(tensor[roster], expected), roster
+
+def test_store_replays_entries_with_fewer_games(tmp_path):
+    environment = IPDGame(min_rounds=5, max_rounds=10)
+    players = genetic_pool()[:2] + [Random()]
+    store = PayoffStore(str(tmp_path))
+
+    store.tensor(environment, players, n_runs=1, seed=0)
+    identities, tensor, n_runs = store.load(environment)
+    assert (n_runs == 1).all()
+
+    store.tensor(environment, players, n_runs=4, seed=0)
+    identities, tensor, n_runs = store.load(environment)
+    assert (n_runs == 4).all()
+
+    # More precise entries serve requests for fewer games
+    before = tensor.copy()
+    store.tensor(environment, players, n_runs=2, seed=1)
+    identities, tensor, n_runs = store.load(environment)
+    assert (n_runs == 4).all() and np.array_equal(before, tensor)
@@ -0,0 +1,197 @@
+import copy
+import random
+import asyncio
+import itertools
+import numpy as np
+import pytest
+from langchain.schema import AIMessage, ChatGeneration, ChatResult
+from langchain.chat_models.base import BaseChatModel
+from эipdai import IPDGame
+from эipdai.strategies import GeneticStrategy, LLMStrategy, SoftT4T, FairT4T, ToughT4T, Naive, Defector, Random, Joss
+from эipdai.tournament import (
+    schedule_games_exhaustive, schedule_games_all_seats, run_tournament, arun_tournament, play_game, aplay_game,
+    seat_players, expected_returns
+)
+
+N_ROUNDS = 5
+
+class SlowChatModel(BaseChatModel):
+    '''
+    Answers after latency seconds, the action depends on the length of the conversation.
+    Counts the games in progress from the first and last requests of conversations of N_ROUNDS rounds.
+    '''
+    latency: float = 0.005
+    n_games: int = 0
+    peak_games: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'slow-fake'
+
+    def _reply(self, messages) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f'Action: {len(messages) % 2}'))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # System message and one observation per round, answers in between
+        if len(messages) == 2:
+            self.n_games += 1
+            self.peak_games = max(self.peak_games, self.n_games)
+        await asyncio.sleep(self.latency)
+        if len(messages) == 2 * N_ROUNDS:
+            self.n_games -= 1
+
+        return self._reply(messages)
+
+def last_moves(observation):
+    moves = observation.T[-1][1:]
+    return None if any(moves < 0) else str(list(moves))
+
+def llm_pool(model):
+    return [LLMStrategy(model, 'Play', last_moves, name='LLM'), Naive(), Defector(), ToughT4T(), SoftT4T()]
+
+def test_exhaustive_schedule_covers_both_opponent_orders():
+    schedule = schedule_games_exhaustive(5)
+
+    seatings = set()
+    for roster in schedule:
+        for seat in range(3):
+            seatings.add((roster[seat], roster[(seat + 1) % 3], roster[(seat + 2) % 3]))
+
+    assert seatings == set(itertools.permutations(range(5), 3))
+    assert len(schedule) == 2 * len(list(itertools.combinations(range(5), 3)))
+
+def test_exhaustive_tournament_averages_both_orders():
+    environment = IPDGame(min_rounds=20, max_rounds=30)
+    rng = np.random.default_rng(0)
+    players = [
+        GeneticStrategy(2, genotype=rng.integers(0, 2, 73).tolist(), name='G1'),
+        GeneticStrategy(2, genotype=rng.integers(0, 2, 73).tolist(), name='G2'),
+        SoftT4T(),
+        FairT4T(),
+        Naive()
+    ]
+
+    results = run_tournament(environment, players, n_runs=1, mode='exhaustive')
+
+    # Deterministic games of all lengths, the player faces every ordered pair of distinct opponents
+    for i, player in enumerate(players):
+        returns = []
+        for j, k in itertools.permutations([p for p in range(len(players)) if p != i], 2):
+            rewards = play_game(
+                environment, seat_players(players, [i, j, k]), {'n_rounds': environment.max_rounds}, per_round=True
+            )
+            returns.append(rewards[:, 0].cumsum()[environment.min_rounds - 1:].mean())
+
+        assert np.isclose(results[player.name], np.mean(returns))
+
+def test_all_seats_schedule_draws_from_rng():
+    schedules = []
+    for global_seed in range(2):
+        np.random.seed(global_seed)
+        random.seed(global_seed)
+        schedules.append(schedule_games_all_seats(7, np.random.default_rng(0)))
+
+    assert schedules[0] == schedules[1]
+    assert {i for roster in schedules[0] for i in roster} == set(range(7))
+    assert all(len(set(roster)) == 3 for roster in schedules[0])
+
+def test_aplay_game_matches_play_game():
+    environment = IPDGame(min_rounds=N_ROUNDS, max_rounds=N_ROUNDS)
+    players = llm_pool(SlowChatModel())[:3]
+
+    rewards = play_game(environment, players, per_round=True)
+    arewards = asyncio.run(aplay_game(environment, players, per_round=True))
+
+    assert np.array_equal(rewards, arewards)
+
+def test_arun_tournament_bounds_games_in_progress():
+    environment = IPDGame(min_rounds=N_ROUNDS, max_rounds=N_ROUNDS)
+
+    results = []
+    for max_concurrency in [1, 3, 64]:
+        model = SlowChatModel()
+        results.append(asyncio.run(arun_tournament(
+            environment, llm_pool(model), n_runs=2, max_concurrency=max_concurrency, seed=0, mode='all_seats'
+        )))
+
+        assert 0 < model.peak_games <= max_concurrency
+
+    assert results[0] == results[1] == results[2]
+
+def test_arun_tournament_all_seats_ignores_global_random_state():
+    environment = IPDGame(min_rounds=N_ROUNDS, max_rounds=N_ROUNDS)
+
+    results = []
+    for global_seed in range(2):
+        np.random.seed(global_seed)
+        random.seed(global_seed)
+        results.append(asyncio.run(arun_tournament(environment, llm_pool(SlowChatModel()), n_runs=1, seed=0, mode='all_seats')))
+
+    assert results[0] == results[1]
+
+@pytest.mark.parametrize('schedule', [schedule_games_all_seats, schedule_games_exhaustive])
+def test_schedules_reject_too_few_players(schedule):
+    with pytest.raises(ValueError):
+        schedule(2)
+
+@pytest.mark.parametrize('mode', ['all_seats', 'exhaustive'])
+def test_tournament_rejects_too_few_players(mode):
+    with pytest.raises(ValueError):
+        run_tournament(IPDGame(min_rounds=5, max_rounds=5), [Naive(), Defector()], n_runs=1, mode=mode)
+
+def deterministic_pool():
+    rng = np.random.default_rng(2)
+    return [SoftT4T(), FairT4T(), ToughT4T(), Naive(), Defector()] + [
+        GeneticStrategy(memory_len, genotype=rng.integers(0, 2, sum(8 ** i for i in range(memory_len + 1))).tolist())
+        for memory_len in [1, 2, 3]
+    ]
+
+def simulated(players):
+    # Players marked stochastic are played round by round without fast-forwarding
+    players = [copy.copy(player) for player in players]
+    for player in players:
+        player.deterministic = False
+    return players
+
+def test_fast_forward_matches_full_simulation():
+    environment = IPDGame(min_rounds=1, max_rounds=500)
+    players = deterministic_pool()
+
+    for roster in itertools.permutations(range(len(players)), 3):
+        seated = seat_players(players, list(roster))
+        for n_rounds in [1, 7, 500]:
+            rewards = play_game(environment, seated, {'n_rounds': n_rounds}, per_round=True)
+            simulated_rewards = play_game(environment, simulated(seated), {'n_rounds': n_rounds}, per_round=True)
+
+            assert np.array_equal(rewards, simulated_rewards)
+            assert np.array_equal(play_game(environment, seated, {'n_rounds': n_rounds}), rewards.sum(axis=0))
+
+@pytest.mark.parametrize('min_rounds,max_rounds', [(1, 1), (5, 60), (60, 60), (30, 400), (390, 400)])
+def test_expected_returns_average_all_end_rounds(min_rounds, max_rounds):
+    environment = IPDGame(min_rounds=min_rounds, max_rounds=max_rounds)
+    players = deterministic_pool()
+
+    for roster in itertools.combinations(range(len(players)), 3):
+        seated = seat_players(players, list(roster))
+        rewards = play_game(environment, simulated(seated), {'n_rounds': max_rounds}, per_round=True)
+
+        assert np.allclose(expected_returns(environment, seated, 1), rewards.cumsum(axis=0)[min_rounds - 1:].mean(axis=0))
+
+@pytest.mark.parametrize('mode', ['focal', 'all_seats', 'exhaustive'])
+def test_seeded_tournament_ignores_workers_and_random_state(mode):
+    environment = IPDGame(min_rounds=5, max_rounds=40)
+    environment.reset(seed=5)
+    players = [Random(), Joss(), SoftT4T(), Naive(), Defector()]
+
+    random.seed(0)
+    np.random.seed(0)
+    serial = run_tournament(environment, players, n_runs=3, seed=1, mode=mode)
+    assert random.random() == random.Random(0).random()
+    assert np.random.random() == np.random.RandomState(0).random_sample()
+
+    parallel = run_tournament(environment, players, n_runs=3, n_workers=2, seed=1, mode=mode)
+
+    assert serial == parallel
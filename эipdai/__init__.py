@@ -1,4 +1,8 @@
 from .common import *
 from .strategies import *
 from .environment import *
-from .tournament import *
\ No newline at end of file
+from .tournament import *
+from .evolution import *
+from .payoffs import *
+from .dynamics import *
+from .islands import *
\ No newline at end of file
@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import random
+import inspect
+import argparse
+import platform
+import subprocess
+import numpy as np
+from .common import Actions
+from .environment import IPDGame
+from .strategies import baselines, Strategy, GeneticStrategy
+from .tournament import run_tournament
+from .evolution import get_population_fitness_func
+from typing import Callable, Dict, List
+
+def measure(function: Callable, min_time: float=0.2, repeat: int=3) -> float:
+    '''
+    Returns the time per call of function in seconds, the best of repeat runs of at least min_time each.
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        n_calls = 0
+        start = time.perf_counter()
+        while (elapsed := time.perf_counter() - start) < min_time or n_calls == 0:
+            function()
+            n_calls += 1
+        best = min(best, elapsed / n_calls)
+
+    return best
+
+def baseline_classes() -> List[type]:
+    '''
+    Returns all strategy classes defined in baselines.
+    '''
+    return [
+        cls for _, cls in inspect.getmembers(baselines, inspect.isclass)
+        if issubclass(cls, Strategy) and cls.__module__ == baselines.__name__
+    ]
+
+def benchmark_environment(max_rounds_values: List[int]=(10, 100, 1000), min_time: float=0.2) -> List[Dict]:
+    '''
+    Measures IPDGame.reset and IPDGame.step, step time is averaged over complete games.
+    '''
+    results = []
+    for max_rounds in max_rounds_values:
+        environment = IPDGame(min_rounds=max_rounds, max_rounds=max_rounds)
+        rng = np.random.default_rng(0)
+        actions = [
+            dict(zip(environment.possible_agents, moves.tolist()))
+            for moves in rng.integers(Actions.C, Actions.D + 1, [max_rounds, len(environment.possible_agents)])
+        ]
+
+        def play():
+            environment.reset(seed=0)
+            for round_actions in actions:
+                environment.step(round_actions)
+
+        reset_time = measure(lambda: environment.reset(seed=0), min_time)
+        game_time = measure(play, min_time)
+
+        results.append({
+            'max_rounds': max_rounds,
+            'reset_us': reset_time * 1e6,
+            'step_us': max(game_time - reset_time, 0) / max_rounds * 1e6,
+            'steps_per_sec': max_rounds / game_time
+        })
+
+    return results
+
+def benchmark_play(
+        players: List[Strategy],
+        n_rounds: int=100,
+        min_time: float=0.2
+    ) -> Dict[str, float]:
+    '''
+    Measures the mean latency of play in microseconds of every player, in games against two Random players.
+    '''
+    environment = IPDGame(min_rounds=n_rounds, max_rounds=n_rounds)
+    opponents = [baselines.Random(), baselines.Random()]
+    for i, opponent in enumerate(opponents):
+        opponent.seed(i)
+
+    results = {}
+    for player in players:
+        player.seed(0)
+        play_time = [0.0]
+
+        def play():
+            observations, infos = environment.reset(seed=0)
+            rewards = {agent: None for agent in environment.possible_agents}
+            for strategy in [player] + opponents:
+                strategy.reset()
+
+            for _ in range(n_rounds):
+                agents = environment.possible_agents
+                start = time.perf_counter()
+                action = player.play(observations[agents[0]], rewards[agents[0]])
+                play_time[0] += time.perf_counter() - start
+
+                actions = {agents[0]: action}
+                for agent, opponent in zip(agents[1:], opponents):
+                    actions[agent] = opponent.play(observations[agent], rewards[agent])
+                observations, rewards, terminations, truncations, infos = environment.step(actions)
+
+        n_games = max(1, round(min_time / measure(play, min_time / 10, repeat=1)))
+        play_time[0] = 0.0
+        for _ in range(n_games):
+            play()
+
+        results[player.name] = play_time[0] / (n_games * n_rounds) * 1e6
+
+    return results
+
+def benchmark_tournament(
+        players: List[Strategy],
+        n_rounds: int=100,
+        n_runs: int=2,
+        min_time: float=1.0
+    ) -> Dict:
+    '''
+    Measures run_tournament throughput in focal mode, in this process.
+    '''
+    environment = IPDGame(min_rounds=n_rounds, max_rounds=n_rounds)
+    # Every focal run plays a schedule_games_subset schedule of all players
+    n_games = len(players) * n_runs * ((len(players) + 1) // 2)
+
+    tournament_time = measure(lambda: run_tournament(environment, players, n_runs, seed=0), min_time, repeat=1)
+
+    return {
+        'n_players': len(players),
+        'n_rounds': n_rounds,
+        'n_games': n_games,
+        'seconds': tournament_time,
+        'games_per_sec': n_games / tournament_time
+    }
+
+def benchmark_fitness(
+        opponents: List[Strategy],
+        memory_len_values: List[int]=(2, 3, 4),
+        pop_size: int=200,
+        n_rounds: int=100,
+        min_time: float=1.0
+    ) -> List[Dict]:
+    '''
+    Measures fitness evaluations per second of the pygad fitness function used in the evolution notebook.
+    '''
+    environment = IPDGame(min_rounds=n_rounds, max_rounds=n_rounds)
+    rng = np.random.default_rng(0)
+
+    results = []
+    for memory_len in memory_len_values:
+        fitness_func = get_population_fitness_func(environment, opponents, memory_len)
+        genotype_len = len(GeneticStrategy(memory_len=memory_len).genotype)
+        population = rng.integers(Actions.C, Actions.D + 1, [pop_size, genotype_len])
+
+        # The first evaluation also compiles the deterministic opponents, later ones reuse them
+        start = time.perf_counter()
+        fitness_func(None, population, None)
+        first_time = time.perf_counter() - start
+
+        evaluation_time = measure(lambda: fitness_func(None, population, None), min_time, repeat=1)
+
+        results.append({
+            'memory_len': memory_len,
+            'pop_size': pop_size,
+            'first_generation_seconds': first_time,
+            'seconds_per_generation': evaluation_time,
+            'evaluations_per_sec': pop_size / evaluation_time
+        })
+
+    return results
+
+def run_benchmarks(quick: bool=False) -> Dict:
+    '''
+    Runs all benchmarks, quick shortens measurements for smoke runs.
+    '''
+    min_time = 0.05 if quick else 0.2
+    random.seed(0)
+    np.random.seed(0)
+
+    representatives = [cls() for cls in baseline_classes()]
+    genetic_players = [
+        GeneticStrategy(memory_len=memory_len, name=f'GeneticStrategy[memory_len={memory_len}]')
+        for memory_len in range(1, 5)
+    ]
+
+    return {
+        'metadata': _metadata(),
+        'environment': benchmark_environment(min_time=min_time),
+        'play_us': benchmark_play(representatives + genetic_players, min_time=min_time),
+        'tournament': benchmark_tournament(representatives, n_runs=1 if quick else 2, min_time=5 * min_time),
+        'fitness': benchmark_fitness(representatives, pop_size=50 if quick else 200, min_time=5 * min_time)
+    }
+
+def _metadata() -> Dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor()
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measures environment, strategy, tournament and fitness throughput.')
+    parser.add_argument('-o', '--output', default='benchmarks.json', help='JSON file to write results to')
+    parser.add_argument('--quick', action='store_true', help='shorter measurements')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.quick)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for entry in results['environment']:
+        print(f'IPDGame max_rounds={entry["max_rounds"]}: reset {entry["reset_us"]:.1f} us, step {entry["step_us"]:.1f} us')
+    for name, latency in results['play_us'].items():
+        print(f'{name}.play: {latency:.1f} us')
+    print(f'run_tournament: {results["tournament"]["games_per_sec"]:.0f} games/s')
+    for entry in results['fitness']:
+        print(f'Fitness memory_len={entry["memory_len"]}: {entry["evaluations_per_sec"]:.0f} evaluations/s')
+    print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
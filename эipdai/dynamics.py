@@ -0,0 +1,149 @@
+import numpy as np
+from typing import Tuple
+
+def population_fitness(
+        tensor: np.ndarray,
+        shares: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Expected return of every strategy in an infinite population, opponents are drawn independently.
+
+    Args:
+        tensor: expected payoff tensor, tensor[i, j, k] is the return of i against j and k
+        shares: population shares of strategies, shape (..., n_strategies)
+
+    Returns: fitness of every strategy, same shape as shares
+    '''
+    return np.einsum('ijk,...j,...k->...i', tensor, shares, shares)
+
+def replicator_dynamics(
+        tensor: np.ndarray,
+        shares: np.ndarray,
+        n_generations: int
+    ) -> np.ndarray:
+    '''
+    Discrete time replicator dynamics, the share of every strategy grows in proportion to its fitness.
+
+    Args:
+        tensor: expected payoff tensor, tensor[i, j, k] is the return of i against j and k
+        shares: initial population shares, shape (..., n_strategies) to run several populations at once
+        n_generations: number of generations
+
+    Returns: shares of every generation, shape (n_generations + 1, ..., n_strategies)
+    '''
+    shares = np.asarray(shares, dtype=float)
+    shares = shares / shares.sum(axis=-1, keepdims=True)
+
+    trajectory = np.empty((n_generations + 1,) + shares.shape)
+    trajectory[0] = shares
+
+    for generation in range(1, n_generations + 1):
+        weighted = shares * population_fitness(tensor, shares)
+        total = weighted.sum(axis=-1, keepdims=True)
+        shares = np.divide(weighted, total, out=shares.copy(), where=total > 0)
+        trajectory[generation] = shares
+
+    return trajectory
+
+def moran_fitness(
+        tensor: np.ndarray,
+        counts: np.ndarray
+    ) -> np.ndarray:
+    '''
+    Expected return of every strategy in a finite population, both opponents are drawn
+    without replacement from the rest of the population.
+
+    Args:
+        tensor: expected payoff tensor, tensor[i, j, k] is the return of i against j and k
+        counts: number of individuals of every strategy, shape (n_runs, n_strategies), at least 3 individuals
+
+    Returns: fitness of every strategy, shape (n_runs, n_strategies)
+    '''
+    counts = np.asarray(counts, dtype=float)
+    population_size = counts.sum(axis=-1, keepdims=True)
+    strategies = np.arange(tensor.shape[0])
+
+    self_self_self = tensor[strategies, strategies, strategies]
+
+    # Opponent counts of strategy i are counts - e_i, expanding the sum over distinct opponent pairs
+    pairs = np.einsum('ijk,rj,rk->ri', tensor, counts, counts)
+    pairs -= counts @ tensor[strategies, strategies, :].T
+    pairs -= counts @ tensor[strategies, :, strategies].T
+    pairs += self_self_self
+    same_pairs = counts @ tensor[:, strategies, strategies].T - self_self_self
+
+    return (pairs - same_pairs) / ((population_size - 1) * (population_size - 2))
+
+def moran_process(
+        tensor: np.ndarray,
+        counts: np.ndarray,
+        n_steps: int,
+        selection_intensity: float=1.0,
+        seed: int=None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Runs independent Moran processes in one batch. In every step an individual is chosen to reproduce
+    with probability proportional to its fitness 1 - w + w * payoff and replaces a uniformly chosen individual.
+
+    Args:
+        tensor: expected payoff tensor, tensor[i, j, k] is the return of i against j and k
+        counts: initial number of individuals of every strategy, shape (n_strategies,) or (n_runs, n_strategies)
+        n_steps: maximum number of steps, runs stop once a single strategy remains
+        selection_intensity: w, 0 is neutral drift
+        seed: random seed
+
+    Returns: final counts of shape (n_runs, n_strategies), step at which every run fixated or -1
+    '''
+    rng = np.random.default_rng(seed)
+
+    counts = np.array(counts, dtype=int, ndmin=2)
+    runs = np.arange(len(counts))
+    fixation_steps = np.where((counts > 0).sum(axis=1) == 1, 0, -1)
+
+    for step in range(1, n_steps + 1):
+        active = fixation_steps < 0
+        if not active.any(): break
+
+        fitness = 1 - selection_intensity + selection_intensity * moran_fitness(tensor, counts[active])
+        birth_weights = counts[active] * np.maximum(fitness, 0)
+        # Fall back to neutral drift in populations without positive fitness
+        no_fitness = birth_weights.sum(axis=1) == 0
+        birth_weights[no_fitness] = counts[active][no_fitness]
+
+        births = _sample(rng, birth_weights)
+        deaths = _sample(rng, counts[active].astype(float))
+
+        active_runs = runs[active]
+        np.add.at(counts, (active_runs, births), 1)
+        np.add.at(counts, (active_runs, deaths), -1)
+
+        fixated = (counts[active_runs] > 0).sum(axis=1) == 1
+        fixation_steps[active_runs[fixated]] = step
+
+    return counts, fixation_steps
+
+def fixation_probability(
+        tensor: np.ndarray,
+        mutant: int,
+        resident: int,
+        population_size: int,
+        n_runs: int,
+        n_steps: int=100000,
+        selection_intensity: float=1.0,
+        seed: int=None
+    ) -> float:
+    '''
+    Estimates the probability that a single mutant takes over a population of residents.
+    '''
+    counts = np.zeros([n_runs, tensor.shape[0]], dtype=int)
+    counts[:, mutant] = 1
+    counts[:, resident] = population_size - 1
+
+    counts, fixation_steps = moran_process(tensor, counts, n_steps, selection_intensity, seed)
+
+    return (counts[:, mutant] == population_size).mean()
+
+def _sample(rng: np.random.Generator, weights: np.ndarray) -> np.ndarray:
+    cumulative = weights.cumsum(axis=1)
+    thresholds = rng.random(len(weights)) * cumulative[:, -1]
+    return np.minimum((cumulative <= thresholds[:, None]).sum(axis=1), weights.shape[1] - 1)
@@ -6,11 +6,60 @@ import pettingzoo
 from typing import Any, Union
 from .common import Actions, N_PLAYERS, PAYOFF_MATRIX
 
+# Number of rounds IPDGame buffers grow by when observations are shorter than the game
+CHUNK_LEN = 1024
+
+class Observation(np.ndarray):
+    '''
+    Observation of a player, rows hold own, first and second opponent actions of the last max_rounds rounds
+    (observation_len rounds if set on reset), padded with Actions.N before the first round.
+
+    Running statistics of the game ride along so that strategies need not rescan the history, 
+    n_rounds is the number of rounds played, the other two have the layout of the observation 
+    and column t holds the totals after the round of column t:
+        defections: number of defections of every player, 
+                    defections[:, -1] - defections[:, -1 - k] counts the last k rounds
+        payoffs: cumulative payoffs of every player
+    Arrays derived from an observation carry no statistics.
+    '''
+    # Statistics buffer of the environment, defection rows above payoff rows, the indices of 
+    # the first element of the observation in it, sliced only when read, and the number of rounds played
+    _statistics = None
+
+    @property
+    def n_rounds(self) -> int:
+        '''
+        Number of rounds played so far.
+        '''
+        return None if self._statistics is None else self._statistics[2]
+
+    @property
+    def defections(self) -> np.ndarray:
+        return self._statistic(0)
+
+    @property
+    def payoffs(self) -> np.ndarray:
+        return self._statistic(1)
+
+    def _statistic(self, i: int) -> np.ndarray:
+        if self._statistics is None:
+            return None
+
+        buffer, index, n_rounds = self._statistics
+        *game, row, column = index
+        row += i * buffer.shape[-2] // 2
+
+        statistic = buffer[tuple(game) + (slice(row, row + N_PLAYERS), slice(column, column + self.shape[-1]))]
+        statistic.flags.writeable = False
+
+        return statistic
+
 class IPDGame(pettingzoo.ParallelEnv):
     '''
     Three player iterated prisoner's dilemma environment
     '''
     metadata = {'render_modes' : ['human'], 'name' : 'IPDGame'}
+    _rng = random
 
     def __init__(
         self,
@@ -31,6 +80,29 @@ class IPDGame(pettingzoo.ParallelEnv):
             low=Actions.N.value, high=Actions.D.value, shape=(N_PLAYERS, self._max_rounds), dtype=np.byte
         )
 
+        # History buffer rows hold players 0, 1, 2, 0, 1 so that every rotated observation is a view, 
+        # the first observation_len columns are padding so that every observation window is full.
+        self._rows = np.array([i % N_PLAYERS for i in range(2 * N_PLAYERS - 1)])
+
+        # Actions followed by payoffs of the history rows, indexed by the outcome of a round, 
+        # actions are also the increments of defection counts
+        moves = np.array([[outcome >> i & 1 for i in range(N_PLAYERS)] for outcome in range(2 ** N_PLAYERS)])[:, self._rows]
+        payoffs = PAYOFF_MATRIX[moves[:, :N_PLAYERS], moves[:, 1:N_PLAYERS + 1], moves[:, 2:]][:, self._rows]
+        self._outcomes = np.concatenate([moves, payoffs], axis=1)
+        self._outcomes.flags.writeable = False
+
+    @property
+    def min_rounds(self) -> int:
+        return self._min_rounds
+
+    @property
+    def max_rounds(self) -> int:
+        return self._max_rounds
+
+    @property
+    def end_round(self) -> int:
+        return self._end_round
+
     @functools.lru_cache(maxsize=None)
     def observation_space(self, agent: str) -> gymnasium.spaces.Space:
         return self._observation_space
@@ -40,46 +112,236 @@ class IPDGame(pettingzoo.ParallelEnv):
         return self._action_space
     
     def step(self, actions: dict) -> tuple[dict, dict[str, int], dict[str, bool], dict[str, bool], dict[str, dict]]:
-        self._round += 1
+        observations, rewards, done = self.step_array(list(actions.values()))
 
-        actions = np.array(list(actions.values()))
+        observations = {self.agents[i]: observations[i] for i in range(len(self.agents))}
+        rewards = {self.agents[i]: rewards[i] for i in range(len(self.agents))} 
 
-        self._history = np.concatenate([self._history[:, 1:], actions[:,None]], axis=1)
-        
-        observations = {
-            self.agents[i]: np.concatenate([self._history[i:], self._history[:i]])
-            for i in range(len(self.agents))
-        }
+        terminations = {agent: done for agent in self.agents}
+        trunctations = {agent: False for agent in self.agents}
+
+        infos = {agent: {} for agent in self.agents}
 
-        rewards = {
-            self.agents[i]: PAYOFF_MATRIX[tuple(np.concatenate([actions[i:], actions[:i]]))]
-            for i in range(len(self.agents))
-        } 
+        return observations, rewards, terminations, trunctations, infos
 
-        terminations = {agent: self._round == self._end_round for agent in self.agents}
-        trunctations = {agent: False for agent in self.agents}
+    def reset(self, seed: int=None, options: dict=None) -> tuple[dict, dict[Any, dict]]:
+        observations = self.reset_array(seed, options)
+
+        observations = {self.agents[i]: observations[i] for i in range(len(self.agents))}
 
         infos = {agent: {} for agent in self.agents}
 
+        return observations, infos
+
+    def step_array(self, actions: np.ndarray) -> tuple[tuple[np.ndarray], np.ndarray, bool]:
+        '''
+        Plays one round without building agent keyed dictionaries.
+
+        Args:
+            actions: actions indexed by agent
+
+        Returns: observations indexed by agent, rewards indexed by agent, whether the game is over
+        '''
+        outcome = self._outcomes[actions[0] + 2 * actions[1] + 4 * actions[2]]
+        rewards = outcome[len(self._rows):len(self._rows) + N_PLAYERS]
+
+        if self._column == self._history.shape[1]:
+            self._next_chunk()
+
+        column = self._column
+        self._history[:, column] = outcome[:len(self._rows)]
+        np.add(self._statistics[:, column - 1], outcome, out=self._statistics[:, column])
+        self._round += 1
+        self._column += 1
+
+        observations = tuple(self._observe(i) for i in range(N_PLAYERS))
+
         if self.render_mode == "human":
             self.render()
 
-        return observations, rewards, terminations, trunctations, infos
+        return observations, rewards, self._round == self._end_round
 
-    def reset(self, seed: int=None, options: dict=None) -> tuple[dict, dict[Any, dict]]:
-        if seed: random.seed(seed)
+    def reset_array(self, seed: int=None, options: dict=None) -> tuple[np.ndarray]:
+        '''
+        Starts a new game without building agent keyed dictionaries.
+
+        Args:
+            seed: seeds the random stream of game lengths, the global random module is used until seeded
+            options: 'n_rounds' fixes the length of the game instead of drawing it at random,
+                     'observation_len' limits observations to the last rounds, max_rounds by default, 
+                     for players that read no further back such as deterministic strategies up to their memory_depth
+
+        Returns: observations indexed by agent
+        '''
+        if seed is not None: self._rng = random.Random(seed)
 
         self.agents = self.possible_agents[:]
 
         self._round = 0 
-        self._end_round = random.randint(self._min_rounds, self._max_rounds)
-        self._history = np.full([N_PLAYERS, self._max_rounds], Actions.N.value)
+        if options and 'n_rounds' in options:
+            self._end_round = options['n_rounds']
+        else:
+            self._end_round = self._rng.randint(self._min_rounds, self._max_rounds)
+        self._observation_len = options.get('observation_len', self._max_rounds) if options else self._max_rounds
 
-        observations = {agent: self._history for agent in self.agents}
+        # Buffers start with observation_len padding columns and are replaced by new chunks as rounds are played,
+        # fresh buffers per game and chunk keep observations returned earlier unchanged
+        self._history = self._statistics = None
+        self._column = 0
+        self._next_chunk()
 
-        infos = {agent: {} for agent in self.agents}
+        return tuple(self._observe(i) for i in range(N_PLAYERS))
 
-        return observations, infos
+    def _next_chunk(self) -> None:
+        '''
+        Starts new buffers holding the last observation_len columns of the current ones and room for 
+        the following rounds, all remaining rounds if observations span max_rounds.
+        '''
+        n_columns = self._observation_len
+        chunk_len = max(1, min(self._end_round - self._round, max(n_columns, CHUNK_LEN)))
+
+        history = np.full([len(self._rows), n_columns + chunk_len], Actions.N.value).view(Observation)
+        # Defection counts and payoffs of the history rows, running statistics share the layout of the history
+        statistics = np.zeros([2 * len(self._rows), n_columns + chunk_len], dtype=int)
+        if self._history is not None:
+            history[:, :n_columns] = self._history[:, self._column - n_columns:self._column]
+            statistics[:, :n_columns] = self._statistics[:, self._column - n_columns:self._column]
+
+        self._history, self._statistics = history, statistics
+        self._column = n_columns
+
+    def _observe(self, agent_idx: int) -> Observation:
+        observation = self._history[agent_idx:agent_idx + N_PLAYERS, self._column - self._observation_len:self._column]
+        observation.flags.writeable = False
+        observation._statistics = (self._statistics, (agent_idx, self._column - self._observation_len), self._round)
+
+        return observation
 
     def render(self) -> Union[np.ndarray, str, list, None]:
-        pass
\ No newline at end of file
+        pass
+
+class BatchIPDGame:
+    '''
+    Batch of independent three player iterated prisoner's dilemma games played in lockstep.
+
+    Every game has its own random end round, finished games are tracked with a done-mask.
+    '''
+    _rng = np.random
+    def __init__(
+        self,
+        min_rounds: int,
+        max_rounds: int,
+        n_games: int,
+        statistics: bool=True
+    ) -> None:
+        '''
+        Args:
+            min_rounds: minimum number of rounds of a game
+            max_rounds: maximum number of rounds of a game
+            n_games: number of games
+            statistics: keeps the running statistics of Observation, needed by observe_game
+        '''
+        self._min_rounds = min_rounds
+        self._max_rounds = max_rounds
+        self._n_games = n_games
+        self._keep_statistics = statistics
+
+        # Rows hold players 0, 1, 2, 0, 1 so that rotated observations are plain slices, 
+        # the first max_rounds columns are padding so that every observation window is full.
+        self._rows = np.array([i % N_PLAYERS for i in range(2 * N_PLAYERS - 1)])
+        self._payoff_rows = tuple(self._rows[i:i + len(self._rows) - N_PLAYERS + 1] for i in range(N_PLAYERS))
+
+    @property
+    def n_games(self) -> int:
+        return self._n_games
+
+    @property
+    def end_rounds(self) -> np.ndarray:
+        return self._end_rounds
+
+    @property
+    def history(self) -> np.ndarray:
+        '''
+        Actions of all games, shape (n_games, N_PLAYERS, max_rounds), column t holds round t.
+        '''
+        return self._buffer[:, :N_PLAYERS, self._max_rounds:]
+
+    def observe(self, seat: int) -> np.ndarray:
+        '''
+        Returns observations of all games for the player in the given seat.
+
+        Args:
+            seat: index of the player
+
+        Returns: array of shape (n_games, N_PLAYERS, max_rounds) in IPDGame observation layout
+        '''
+        return self._buffer[:, seat:seat + N_PLAYERS, self._round:self._round + self._max_rounds]
+
+    def observe_game(self, seat: int, game: int) -> Observation:
+        '''
+        Returns the observation of one game for the player in the given seat, with running statistics.
+        '''
+        if not self._keep_statistics:
+            raise ValueError('Statistics are not kept, see statistics of BatchIPDGame')
+
+        window = (game, slice(seat, seat + N_PLAYERS), slice(self._round, self._round + self._max_rounds))
+
+        observation = self._buffer[window].view(Observation)
+        observation._statistics = (self._statistics, (game, seat, self._round), self._round)
+
+        return observation
+    
+    def step(self, actions: np.ndarray) -> tuple[tuple[np.ndarray], np.ndarray, np.ndarray]:
+        '''
+        Plays one round of every game.
+
+        Args:
+            actions: array of shape (n_games, N_PLAYERS), ignored for finished games
+
+        Returns: observations for each seat, rewards of shape (n_games, N_PLAYERS), done-mask
+        '''
+        actions = np.asarray(actions)
+        active = self._round < self._end_rounds
+
+        actions = np.where(active[:, None], actions, Actions.N.value)[:, self._rows]
+
+        payoff_idx = np.maximum(actions, 0)
+        rewards = PAYOFF_MATRIX[tuple(payoff_idx[:, rows] for rows in self._payoff_rows)] * active[:, None]
+
+        column = self._max_rounds + self._round
+        self._buffer[:, :, column] = actions
+        if self._keep_statistics:
+            self._statistics[:, :, column] = self._statistics[:, :, column - 1] + np.concatenate(
+                [payoff_idx, rewards[:, self._rows]], axis=1
+            )
+
+        self._round += 1
+
+        observations = tuple(self.observe(i) for i in range(N_PLAYERS))
+
+        return observations, rewards, self._round >= self._end_rounds
+
+    def reset(self, seed: int=None, options: dict=None) -> tuple[np.ndarray]:
+        '''
+        Starts new games.
+
+        Args:
+            seed: seeds the random stream of game lengths, the global numpy random state is used until seeded
+            options: 'end_rounds' fixes the length of every game instead of drawing them at random
+
+        Returns: observations for each seat
+        '''
+        if seed is not None: self._rng = np.random.RandomState(seed)
+
+        self._round = 0
+        if options and 'end_rounds' in options:
+            self._end_rounds = np.asarray(options['end_rounds'])
+        else:
+            self._end_rounds = self._rng.randint(self._min_rounds, self._max_rounds + 1, size=self._n_games)
+        self._buffer = np.full(
+            [self._n_games, len(self._rows), 2 * self._max_rounds], Actions.N.value
+        )
+        if self._keep_statistics:
+            self._statistics = np.zeros([self._n_games, 2 * len(self._rows), 2 * self._max_rounds], dtype=np.int32)
+
+        return tuple(self.observe(i) for i in range(N_PLAYERS))
@@ -0,0 +1,528 @@
+import copy
+import json
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from .common import N_OUTCOMES, N_PLAYERS, PAYOFF_MATRIX
+from .environment import IPDGame, BatchIPDGame
+from .strategies import Strategy, Automaton, OUTCOME_COEF, compile_strategy, genetic_transitions, table_step
+from .strategies import from_canonical, to_canonical
+from .tournament import schedule_games_subset
+from typing import Callable, List, Tuple
+
+def play_population_games(
+        genotypes: np.ndarray,
+        memory_len: int,
+        opponents: List[Strategy],
+        environment: IPDGame,
+        individuals: np.ndarray,
+        rosters: List[List[int]],
+        end_rounds: np.ndarray=None,
+        opponent_seeds: np.ndarray=None
+    ) -> np.ndarray:
+    '''
+    Plays games between genotypes in seat 0 and pairs of opponents, all games in lockstep.
+
+    Genotypes and deterministic opponents run as automata through table_step, 
+    only stochastic opponents and opponents that do not compile are played one game at a time.
+
+    Args:
+        genotypes: GeneticStrategy genotypes, shape (pop_size, genotype_len)
+        memory_len: memory length of the genotypes
+        opponents: opponent pool
+        environment: game parameters
+        individuals: genotype index of every game
+        rosters: opponent indices of every game
+        end_rounds: length of every game, drawn at random if not given
+        opponent_seeds: random seeds of both opponents of every game, shape (n_games, 2)
+
+    Returns: return of the genotype in every game
+    '''
+    genes = np.asarray(genotypes, dtype=np.int8)
+    individuals = np.asarray(individuals, dtype=int)
+    genes_transitions = genetic_transitions(memory_len)
+
+    automata = [compile_opponent(opponent, environment.max_rounds) for opponent in opponents]
+    automata_offsets = np.cumsum([0] + [0 if automaton is None else automaton.n_states for automaton in automata])
+    automata_actions = np.concatenate([np.zeros(0, dtype=np.int8)] + [
+        automaton.actions for automaton in automata if automaton is not None
+    ])
+    automata_transitions = np.concatenate([np.zeros([0, N_OUTCOMES], dtype=np.int32)] + [
+        automaton.transitions + offset for automaton, offset in zip(automata, automata_offsets) if automaton is not None
+    ])
+
+    rosters = np.array(rosters, dtype=int).reshape(-1, N_PLAYERS - 1)
+    compiled = np.array([automaton is not None for automaton in automata])[rosters]
+    opponents_states = np.where(compiled, automata_offsets[rosters], 0)
+
+    players = [[None] * (N_PLAYERS - 1) for _ in range(len(rosters))]
+    for g, i in zip(*np.nonzero(~compiled)):
+        players[g][i] = copy.copy(opponents[rosters[g, i]])
+        if opponent_seeds is not None:
+            players[g][i].seed(int(opponent_seeds[g][i]))
+        players[g][i].reset()
+    python_games = np.flatnonzero(~compiled.all(axis=1))
+
+    batch = BatchIPDGame(environment.min_rounds, environment.max_rounds, len(rosters), statistics=len(python_games) > 0)
+    batch.reset(options=None if end_rounds is None else {'end_rounds': end_rounds})
+    rewards = np.zeros([batch.n_games, N_PLAYERS], dtype=int)
+    returns = np.zeros(batch.n_games, dtype=int)
+
+    # Seat i sees the moves of seats i, i + 1 and i + 2 as own, first and second opponent
+    seats_outcome_coef = np.array([np.roll(OUTCOME_COEF, seat) for seat in range(1, N_PLAYERS)])
+    genes_states = np.zeros(batch.n_games, dtype=int)
+    genes_outcomes = opponents_outcomes = None
+
+    actions = np.zeros([batch.n_games, N_PLAYERS], dtype=int)
+    done = np.zeros(batch.n_games, dtype=bool)
+    n_rounds = 0
+
+    while not done.all():
+        genes_states, actions[:, 0] = table_step(
+            genes, genes_transitions, genes_states, genes_outcomes, tables=individuals
+        )
+        if len(automata_actions):
+            opponents_states, actions[:, 1:] = table_step(
+                automata_actions, automata_transitions, opponents_states, opponents_outcomes
+            )
+
+        for g in python_games[~done[python_games]]:
+            for i, player in enumerate(players[g], start=1):
+                if player is not None:
+                    actions[g, i] = player.play(batch.observe_game(i, g), rewards[g, i] if n_rounds else None)
+
+        _, rewards, done = batch.step(actions)
+        returns += rewards[:, 0]
+
+        last_moves = batch.history[:, :, n_rounds]
+        genes_outcomes = last_moves @ OUTCOME_COEF
+        opponents_outcomes = last_moves @ seats_outcome_coef.T
+        n_rounds += 1
+
+    return returns
+
+def compile_opponent(opponent: Strategy, max_rounds: int) -> Automaton:
+    '''
+    Compiles a deterministic opponent for games of up to max_rounds rounds, 
+    None for stochastic opponents and opponents with too many states. Automata are cached by identity.
+    '''
+    if not opponent.deterministic:
+        return None
+
+    key = (opponent.identity, max_rounds)
+    if key not in _compiled_opponents:
+        try:
+            _compiled_opponents[key] = compile_strategy(opponent, max_rounds)
+        except ValueError:
+            _compiled_opponents[key] = None
+
+    return _compiled_opponents[key]
+
+_compiled_opponents = {}
+
+def schedule_population_games(
+        candidates: np.ndarray,
+        n_schedules: int,
+        n_opponents: int,
+        environment: IPDGame,
+        rng: np.random.Generator=None,
+        common_random_numbers: bool=True
+    ) -> Tuple[np.ndarray, List[List[int]], np.ndarray, np.ndarray]:
+    '''
+    Schedules n_schedules schedule_games_subset schedules for every candidate.
+
+    With rng given, schedules, game lengths and opponent random streams are drawn from it. 
+    Common random numbers are then used unless disabled: all candidates face the same schedules, 
+    game lengths and opponent random streams, so that fitness differences reflect the genotypes.
+
+    Returns: individuals, rosters, end rounds and opponent seeds of every game, see play_population_games
+    '''
+    if rng is None:
+        rosters = [
+            roster 
+            for _ in range(len(candidates) * n_schedules) 
+            for roster in schedule_games_subset(n_opponents)
+        ]
+        return np.repeat(candidates, len(rosters) // max(1, len(candidates))), rosters, None, None
+
+    # Candidates share one draw with common random numbers, otherwise every candidate gets its own
+    n_draws, n_copies = (1, len(candidates)) if common_random_numbers else (len(candidates), 1)
+
+    rosters = [roster for _ in range(n_draws * n_schedules) for roster in schedule_games_subset(n_opponents, rng)]
+    end_rounds = rng.integers(environment.min_rounds, environment.max_rounds + 1, size=len(rosters))
+    opponent_seeds = rng.integers(2**32, size=[len(rosters), N_PLAYERS - 1])
+
+    return (
+        np.repeat(candidates, len(rosters) * n_copies // max(1, len(candidates))), 
+        rosters * n_copies, 
+        np.tile(end_rounds, n_copies), 
+        np.tile(opponent_seeds, [n_copies, 1])
+    )
+
+def evaluate_population(
+        genotypes: np.ndarray,
+        memory_len: int,
+        opponents: List[Strategy],
+        environment: IPDGame,
+        seed: int=None,
+        common_random_numbers: bool=True
+    ) -> np.ndarray:
+    '''
+    Plays a schedule_games_subset schedule for every genotype, all games of all individuals in lockstep.
+
+    Args:
+        genotypes: GeneticStrategy genotypes, shape (pop_size, genotype_len)
+        memory_len: memory length of the genotypes
+        opponents: opponent pool
+        environment: game parameters
+        seed: seeds schedules, game lengths and opponent random streams, the global random state is used if not set
+        common_random_numbers: with seed, all individuals face the same games, see schedule_population_games
+
+    Returns: mean return per game of every individual
+    '''
+    rng = None if seed is None else np.random.default_rng(seed)
+
+    games = schedule_population_games(
+        np.arange(len(genotypes)), 1, len(opponents), environment, rng, common_random_numbers
+    )
+
+    returns = play_population_games(genotypes, memory_len, opponents, environment, *games)
+
+    return returns.reshape(len(genotypes), -1).mean(axis=1)
+
+def evaluate_population_racing(
+        genotypes: np.ndarray,
+        memory_len: int,
+        opponents: List[Strategy],
+        environment: IPDGame,
+        budgets: List[int]=(1, 2, 6),
+        keep_fraction: float=0.25,
+        n_parents: int=5,
+        confidence: float=2.0,
+        seed: int=None
+    ) -> np.ndarray:
+    '''
+    Successive halving evaluation. After every stage the bottom of the population is dropped,
+    only candidates that may still reach the n_parents best get more games.
+
+    Budgets count whole schedule_games_subset schedules, so that every stage faces a balanced set of opponents.
+
+    Args:
+        genotypes: GeneticStrategy genotypes, shape (pop_size, genotype_len)
+        memory_len: memory length of the genotypes
+        opponents: opponent pool
+        environment: game parameters
+        budgets: total number of schedules of a surviving individual after every stage
+        keep_fraction: maximum fraction of candidates surviving a stage
+        n_parents: number of best individuals that always survive
+        confidence: number of standard errors, candidates whose mean plus confidence standard errors 
+                    is below the mean minus confidence standard errors of the n_parents-th best are dropped
+        seed: enables common random numbers, see schedule_population_games
+
+    Returns: mean return per game of every individual over the games it played
+    '''
+    if len(budgets) == 0 or budgets[0] <= 0 or any(later <= earlier for earlier, later in zip(budgets, budgets[1:])):
+        raise ValueError(f'Budgets have to be positive and strictly increasing, got {list(budgets)}')
+
+    rng = None if seed is None else np.random.default_rng(seed)
+    pop_size = len(genotypes)
+    n_schedule_games = (len(opponents) + 1) // 2
+
+    tallies = np.zeros(pop_size)
+    squares = np.zeros(pop_size)
+    n_games = np.zeros(pop_size, dtype=int)
+
+    candidates = np.arange(pop_size)
+
+    for stage, budget in enumerate(budgets):
+        n_new_schedules = budget - n_games[candidates[0]] // n_schedule_games
+
+        games = schedule_population_games(candidates, n_new_schedules, len(opponents), environment, rng)
+        individuals = games[0]
+
+        returns = play_population_games(genotypes, memory_len, opponents, environment, *games)
+
+        np.add.at(tallies, individuals, returns)
+        np.add.at(squares, individuals, returns ** 2)
+        n_games[candidates] = budget * n_schedule_games
+
+        if stage == len(budgets) - 1 or len(candidates) <= n_parents: break
+
+        means = tallies[candidates] / n_games[candidates]
+        errors = np.sqrt(np.maximum(squares[candidates] / n_games[candidates] - means ** 2, 0) / n_games[candidates])
+
+        order = np.argsort(-means, kind='stable')
+        threshold = means[order[n_parents - 1]] - confidence * errors[order[n_parents - 1]]
+
+        n_kept = max(n_parents, int(np.ceil(keep_fraction * len(candidates))))
+        kept = order[:n_kept]
+        kept = kept[(np.arange(len(kept)) < n_parents) | (means[kept] + confidence * errors[kept] >= threshold)]
+
+        candidates = candidates[np.sort(kept)]
+
+    return tallies / n_games
+
+def get_population_fitness_func(
+        environment: IPDGame,
+        opponents: List[Strategy],
+        memory_len: int,
+        common_random_numbers: bool=False,
+        seed: int=None
+    ) -> Callable:
+    '''
+    Returns a pygad fitness function evaluating a whole batch of solutions at once (requires fitness_batch_size).
+
+    Args:
+        environment: game parameters
+        opponents: opponent pool
+        memory_len: memory length of the genotypes
+        common_random_numbers: evaluates all solutions of a generation with the same schedules, 
+                               game lengths and opponent random streams
+        seed: master seed, every generation draws its games from a seed derived from it and generations_completed,
+              the global random state is used if neither seed nor common_random_numbers is set
+    '''
+    entropy = np.random.SeedSequence(seed).entropy
+
+    def fitness_func(ga_instance, solutions, solutions_indices):
+        if seed is None and not common_random_numbers:
+            return evaluate_population(solutions, memory_len, opponents, environment)
+
+        key = [entropy, getattr(ga_instance, 'generations_completed', 0)]
+        if not common_random_numbers and solutions_indices is not None and len(solutions_indices):
+            # Batches of a generation face independent games unless they share them
+            key.append(int(np.min(solutions_indices)))
+        generation_seed = int(np.random.SeedSequence(key).generate_state(1)[0])
+
+        return evaluate_population(solutions, memory_len, opponents, environment, generation_seed, common_random_numbers)
+
+    return fitness_func
+
+class FitnessCache:
+    '''
+    LRU cache of population fitness values.
+
+    Entries are keyed by a hash of the packed genotype together with the opponent pool and game parameters. 
+    With n_samples > 1 a genotype is evaluated again on each of its first n_samples occurrences and 
+    the cached fitness is the mean of all its evaluations, so repeated noisy evaluations refine the estimate.
+    '''
+    def __init__(
+        self,
+        memory_len: int,
+        opponents: List[Strategy],
+        environment: IPDGame,
+        maxsize: int=100000,
+        n_samples: int=1,
+        fitness_func: Callable=None
+    ) -> None:
+        '''
+        Args:
+            memory_len: memory length of the genotypes
+            opponents: opponent pool
+            environment: game parameters
+            maxsize: maximum number of cached genotypes
+            n_samples: number of evaluations averaged per genotype
+            fitness_func: maps a population array to fitness values, evaluate_population by default
+        '''
+        self._maxsize = maxsize
+        self._n_samples = n_samples
+
+        if fitness_func is None:
+            fitness_func = lambda population: evaluate_population(population, memory_len, opponents, environment)
+        self._fitness_func = fitness_func
+
+        self._context = json.dumps({
+            'memory_len': memory_len,
+            'opponents': [opponent.identity for opponent in opponents],
+            'min_rounds': environment.min_rounds,
+            'max_rounds': environment.max_rounds,
+            'payoff_matrix': PAYOFF_MATRIX.tolist()
+        }).encode()
+
+        # key -> [mean fitness, number of evaluations]
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __call__(self, population: np.ndarray) -> np.ndarray:
+        population = np.asarray(population, dtype=np.uint8)
+        keys = [self.key(genotype) for genotype in population]
+
+        pending = {}
+        for i, key in enumerate(keys):
+            entry = self._entries.get(key)
+            if key not in pending and (entry is None or entry[1] < self._n_samples):
+                pending[key] = i
+
+        self.misses += len(pending)
+        self.hits += len(keys) - len(pending)
+
+        if pending:
+            fitness = np.asarray(self._fitness_func(population[list(pending.values())]), dtype=float)
+            for key, value in zip(pending, fitness):
+                mean, count = self._entries.get(key, [0.0, 0])
+                self._entries[key] = [(mean * count + value) / (count + 1), count + 1]
+
+        for key in keys:
+            self._entries.move_to_end(key)
+
+        result = np.array([self._entries[key][0] for key in keys])
+
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+        return result
+
+    def key(self, genotype: np.ndarray) -> bytes:
+        return hashlib.blake2b(self._context + np.packbits(genotype).tobytes(), digest_size=16).digest()
+
+class GeneticAlgorithm:
+    '''
+    Genetic algorithm evolving GeneticStrategy genotypes. 
+
+    The population is a single (pop_size, genotype_len) uint8 array, selection, crossover and mutation 
+    act on the whole population at once and fitness is evaluated in batches. Defaults follow the 
+    pygad configuration of the evolution notebook: rank selection, uniform crossover and one elite.
+    '''
+    def __init__(
+        self,
+        memory_len: int,
+        opponents: List[Strategy],
+        environment: IPDGame,
+        pop_size: int=200,
+        num_parents_mating: int=5,
+        keep_elitism: int=1,
+        mutation_probability: float=0.1,
+        initial_population: np.ndarray=None,
+        fitness_func: Callable=None,
+        common_random_numbers: bool=False,
+        canonical: bool=False,
+        seed: int=None
+    ) -> None:
+        '''
+        Args:
+            memory_len: memory length of the evolved strategies
+            opponents: opponent pool
+            environment: game parameters
+            pop_size: number of individuals, ignored if initial_population is given
+            num_parents_mating: number of parents selected every generation
+            keep_elitism: number of best individuals copied to the next generation
+            mutation_probability: probability of flipping every gene of an offspring
+            initial_population: initial genotypes, random if not given
+            fitness_func: maps a population array to fitness values, evaluate_population by default
+            common_random_numbers: evaluates all individuals of a generation with the same schedules, 
+                                   game lengths and opponent random streams, only for the default fitness_func
+            canonical: evolves genotypes in the canonical encoding of GeneticStrategy, 
+                       fitness_func still receives full genotypes
+            seed: random seed of the evolution and of the games of the default fitness_func
+        '''
+        self._memory_len = memory_len
+        self._opponents = opponents
+        self._environment = environment
+        self._common_random_numbers = common_random_numbers
+        self._canonical = canonical
+        self._num_parents_mating = num_parents_mating
+        self._keep_elitism = keep_elitism
+        self._mutation_probability = mutation_probability
+        self._rng = np.random.default_rng(seed)
+
+        self._fitness_func = fitness_func
+
+        genotype_len = sum([N_OUTCOMES ** i for i in range(memory_len + 1)])
+        if canonical:
+            genotype_len = len(to_canonical(np.zeros(genotype_len), memory_len))
+        if initial_population is None:
+            self.population = self._random_bits([pop_size, genotype_len])
+        else:
+            self.population = np.array(initial_population, dtype=np.uint8)
+
+        self.generations_completed = 0
+        self.last_generation_fitness = None
+        self.best_solutions_fitness = []
+
+    def run(self, num_generations: int, on_generation: Callable=None) -> None:
+        '''
+        Evolves the population for num_generations, on_generation is called with the instance after every generation.
+        '''
+        for _ in range(num_generations):
+            if self.last_generation_fitness is None:
+                self.last_generation_fitness = self.evaluate(self.population)
+
+            self.population = self.next_generation(self.population, self.last_generation_fitness)
+
+            self.last_generation_fitness = self.evaluate(self.population)
+            self.best_solutions_fitness.append(self.last_generation_fitness.max())
+            self.generations_completed += 1
+
+            if on_generation is not None:
+                on_generation(self)
+
+    def evaluate(self, population: np.ndarray) -> np.ndarray:
+        if self._canonical:
+            population = from_canonical(population, self._memory_len)
+
+        if self._fitness_func is not None:
+            return np.asarray(self._fitness_func(population), dtype=float)
+
+        # Games are drawn from the random stream of the algorithm so that seeded runs repeat
+        seed = int(self._rng.integers(2**32))
+
+        return evaluate_population(
+            population, self._memory_len, self._opponents, self._environment, seed, self._common_random_numbers
+        )
+
+    def best_solution(self) -> tuple[np.ndarray, float]:
+        '''
+        Returns the best genotype of the current population and its fitness.
+        '''
+        if self.last_generation_fitness is None:
+            self.last_generation_fitness = self.evaluate(self.population)
+
+        best = self.last_generation_fitness.argmax()
+
+        return self.population[best], self.last_generation_fitness[best]
+
+    def next_generation(self, population: np.ndarray, fitness: np.ndarray) -> np.ndarray:
+        order = np.argsort(-fitness, kind='stable')
+
+        parents = population[self.select_parents(order)]
+        offspring = self.crossover(parents, len(population) - self._keep_elitism)
+        self.mutate(offspring)
+
+        return np.concatenate([population[order[:self._keep_elitism]], offspring])
+
+    def select_parents(self, order: np.ndarray) -> np.ndarray:
+        '''
+        Rank selection, the probability of picking an individual is proportional to its rank, worst has rank 1.
+        '''
+        ranks = np.arange(len(order), 0, -1)
+        return order[self._rng.choice(len(order), size=self._num_parents_mating, p=ranks / ranks.sum())]
+
+    def crossover(self, parents: np.ndarray, n_offspring: int) -> np.ndarray:
+        '''
+        Uniform crossover, offspring k takes every gene from parent k or parent k + 1 with equal probability.
+        '''
+        first = np.arange(n_offspring) % len(parents)
+        second = (first + 1) % len(parents)
+
+        genes_sources = self._random_bits([n_offspring, parents.shape[1]]).view(bool)
+
+        return np.where(genes_sources, parents[second], parents[first])
+
+    def mutate(self, offspring: np.ndarray) -> None:
+        '''
+        Flips every gene with mutation_probability, in place.
+        '''
+        n_mutations = self._rng.binomial(offspring.size, self._mutation_probability)
+        # Sampling positions instead of a random number per gene keeps memory low for large populations,
+        # repeated positions are flipped once
+        mutated = np.zeros(offspring.size, dtype=bool)
+        mutated[self._rng.integers(offspring.size, size=n_mutations)] = True
+
+        offspring ^= mutated.reshape(offspring.shape)
+
+    def _random_bits(self, shape: list) -> np.ndarray:
+        random_bytes = self._rng.integers(256, size=[shape[0], -(-shape[1] // 8)], dtype=np.uint8)
+        return np.unpackbits(random_bytes, axis=1, count=shape[1])
@@ -0,0 +1,295 @@
+import os
+import json
+import numpy as np
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from .environment import IPDGame
+from .strategies import Strategy
+from .evolution import GeneticAlgorithm
+from .tournament import spawn_seeds
+from typing import Callable, List, Tuple, Union
+
+def migration_sources(topology: Union[str, List[List[int]]], n_islands: int) -> List[List[int]]:
+    '''
+    Returns the islands every island receives migrants from.
+
+    Args:
+        topology: 'ring', every island receives from the previous one,
+                  'fully_connected', every island receives from all others,
+                  or explicit lists of source islands
+        n_islands: number of islands
+    '''
+    if topology == 'ring':
+        return [[(i - 1) % n_islands] for i in range(n_islands)] if n_islands > 1 else [[]]
+    elif topology == 'fully_connected':
+        return [[j for j in range(n_islands) if j != i] for i in range(n_islands)]
+    elif isinstance(topology, str):
+        raise ValueError(f'Unknown topology {topology}')
+
+    if len(topology) != n_islands:
+        raise ValueError(f'Topology has {len(topology)} entries for {n_islands} islands')
+
+    return [list(sources) for sources in topology]
+
+class IslandModel:
+    '''
+    Island model genetic algorithm, evolves several GeneticAlgorithm populations independently
+    and copies the best genotypes of every island over the worst of its neighbours every migration_interval generations.
+
+    Islands can be evolved in worker processes. Populations and fitness values live in one shared memory block,
+    workers evolve their islands between migrations and the main process migrates genotypes in place,
+    so only commands pass through pipes.
+    '''
+    def __init__(
+        self,
+        memory_len: int,
+        opponents: List[Strategy],
+        environment: IPDGame,
+        n_islands: int=4,
+        pop_size: int=200,
+        migration_interval: int=10,
+        n_migrants: int=2,
+        topology: Union[str, List[List[int]]]='ring',
+        n_workers: int=None,
+        seed: int=None,
+        **kwargs
+    ) -> None:
+        '''
+        Args:
+            memory_len: memory length of the evolved strategies
+            opponents: opponent pool
+            environment: game parameters
+            n_islands: number of islands
+            pop_size: number of individuals of every island
+            migration_interval: number of generations between migrations
+            n_migrants: number of best genotypes every source island sends
+            topology: see migration_sources
+            n_workers: number of worker processes, islands are evolved in this process if not set
+            seed: master seed, every island gets its own random stream derived from it, 
+                  which also draws the games of the default fitness evaluation
+            kwargs: GeneticAlgorithm parameters shared by all islands
+        '''
+        self._migration_interval = migration_interval
+        self._n_migrants = n_migrants
+        self._sources = migration_sources(topology, n_islands)
+        self._n_workers = n_workers
+
+        self.islands = [
+            GeneticAlgorithm(memory_len, opponents, environment, pop_size=pop_size, seed=island_seed, **kwargs)
+            for island_seed in spawn_seeds(seed, n_islands)
+        ]
+
+        self.generations_completed = 0
+
+    @property
+    def n_islands(self) -> int:
+        return len(self.islands)
+
+    @property
+    def best_solutions_fitness(self) -> np.ndarray:
+        '''
+        Best fitness of every island after every generation, shape (n_islands, generations_completed).
+        '''
+        return np.array([island.best_solutions_fitness for island in self.islands]).reshape(self.n_islands, -1)
+
+    def best_solution(self) -> Tuple[np.ndarray, float]:
+        '''
+        Returns the best genotype over all islands and its fitness.
+        '''
+        solutions = [island.best_solution() for island in self.islands]
+        return max(solutions, key=lambda solution: solution[1])
+
+    def run(self, num_generations: int, on_migration: Callable=None, checkpoint_path: str=None) -> None:
+        '''
+        Evolves all islands for num_generations, migrating every migration_interval generations.
+
+        Args:
+            num_generations: number of generations
+            on_migration: called with the instance after every migration
+            checkpoint_path: the state is saved there after every migration
+        '''
+        shape = [self.n_islands] + list(self.islands[0].population.shape)
+        shared = SharedMemory(create=True, size=_shared_size(shape))
+        workers = []
+        try:
+            populations, fitness = _shared_arrays(shared, shape)
+            for i, island in enumerate(self.islands):
+                populations[i] = island.population
+                fitness[i] = np.nan if island.last_generation_fitness is None else island.last_generation_fitness
+
+            if self._n_workers is not None:
+                workers = self._start_workers(shared.name, shape)
+
+            while num_generations > 0:
+                # Migrations happen on multiples of migration_interval so that resumed runs keep the same schedule
+                n_generations = min(
+                    num_generations,
+                    self._migration_interval - self.generations_completed % self._migration_interval
+                )
+
+                if workers:
+                    for connection, process in workers:
+                        connection.send(n_generations)
+                    for connection, process in workers:
+                        connection.recv()
+                else:
+                    _run_islands(self.islands, range(self.n_islands), populations, fitness, n_generations)
+
+                self.generations_completed += n_generations
+                num_generations -= n_generations
+
+                if self.generations_completed % self._migration_interval == 0:
+                    self.migrate(populations, fitness)
+
+                    if checkpoint_path is not None or on_migration is not None:
+                        self._collect(workers, populations, fitness)
+                    if checkpoint_path is not None:
+                        self.save(checkpoint_path)
+                    if on_migration is not None:
+                        on_migration(self)
+
+            self._collect(workers, populations, fitness)
+        finally:
+            for connection, process in workers:
+                connection.send(None)
+                process.join()
+            # Views into the block have to be released before closing it
+            populations = fitness = None
+            shared.close()
+            shared.unlink()
+
+    def migrate(self, populations: np.ndarray, fitness: np.ndarray) -> None:
+        '''
+        Replaces the worst individuals of every island by the best of its sources, in place.
+
+        Args:
+            populations: genotypes of all islands, shape (n_islands, pop_size, genotype_len)
+            fitness: fitness of all individuals, shape (n_islands, pop_size)
+        '''
+        best = np.argsort(-fitness, axis=1, kind='stable')[:, :self._n_migrants]
+        migrants = [populations[i, best[i]].copy() for i in range(self.n_islands)]
+        migrants_fitness = [fitness[i, best[i]].copy() for i in range(self.n_islands)]
+
+        for i, sources in enumerate(self._sources):
+            if not sources: continue
+
+            worst = np.argsort(fitness[i], kind='stable')[:len(sources) * self._n_migrants]
+            populations[i, worst] = np.concatenate([migrants[j] for j in sources])[:len(worst)]
+            fitness[i, worst] = np.concatenate([migrants_fitness[j] for j in sources])[:len(worst)]
+
+    def save(self, path: str) -> None:
+        '''
+        Saves populations, fitness, random states and histories of all islands.
+        '''
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(
+            tmp_path,
+            populations=np.array([island.population for island in self.islands]),
+            fitness=np.array([_fitness_or_nan(island) for island in self.islands]),
+            best_solutions_fitness=self.best_solutions_fitness,
+            generations_completed=np.array([island.generations_completed for island in self.islands]),
+            rng_states=np.array(json.dumps([island._rng.bit_generator.state for island in self.islands])),
+            model_generations_completed=np.array(self.generations_completed)
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        '''
+        Restores a state saved by save, the model has to be created with the same parameters.
+        '''
+        with np.load(path) as data:
+            if len(data['populations']) != self.n_islands:
+                raise ValueError(f'Checkpoint has {len(data["populations"])} islands, model has {self.n_islands}')
+
+            rng_states = json.loads(str(data['rng_states']))
+            for i, island in enumerate(self.islands):
+                island.population = data['populations'][i].copy()
+                island.last_generation_fitness = None if np.isnan(data['fitness'][i]).any() else data['fitness'][i].copy()
+                island.best_solutions_fitness = data['best_solutions_fitness'][i].tolist()
+                island.generations_completed = int(data['generations_completed'][i])
+                island._rng.bit_generator.state = rng_states[i]
+
+            self.generations_completed = int(data['model_generations_completed'])
+
+    def _start_workers(self, shared_name: str, shape: list) -> list:
+        workers = []
+        for worker in range(min(self._n_workers, self.n_islands)):
+            island_ids = list(range(worker, self.n_islands, self._n_workers))
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_island_worker,
+                args=(worker_connection, shared_name, shape, [self.islands[i] for i in island_ids], island_ids),
+                daemon=True
+            )
+            process.start()
+            workers.append((connection, process))
+
+        return workers
+
+    def _collect(self, workers: list, populations: np.ndarray, fitness: np.ndarray) -> None:
+        '''
+        Brings the islands of this process up to date with the workers and the shared arrays.
+        '''
+        for connection, process in workers:
+            connection.send('collect')
+            for i, island in connection.recv():
+                self.islands[i] = island
+
+        for i, island in enumerate(self.islands):
+            island.population = populations[i].copy()
+            island.last_generation_fitness = None if np.isnan(fitness[i]).any() else fitness[i].copy()
+
+def _run_islands(
+        islands: List[GeneticAlgorithm],
+        island_ids: List[int],
+        populations: np.ndarray,
+        fitness: np.ndarray,
+        n_generations: int
+    ) -> None:
+
+    for i, island in zip(island_ids, islands):
+        island.population = populations[i].copy()
+        island.last_generation_fitness = None if np.isnan(fitness[i]).any() else fitness[i].copy()
+
+        island.run(n_generations)
+
+        populations[i] = island.population
+        fitness[i] = island.last_generation_fitness
+
+def _island_worker(
+        connection,
+        shared_name: str,
+        shape: list,
+        islands: List[GeneticAlgorithm],
+        island_ids: List[int]
+    ) -> None:
+
+    shared = SharedMemory(name=shared_name)
+    try:
+        populations, fitness = _shared_arrays(shared, shape)
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+            elif command == 'collect':
+                connection.send(list(zip(island_ids, islands)))
+            else:
+                _run_islands(islands, island_ids, populations, fitness, command)
+                connection.send(True)
+    finally:
+        populations = fitness = None
+        shared.close()
+
+def _shared_size(shape: list) -> int:
+    return int(np.prod(shape[:2])) * (np.dtype(float).itemsize + shape[2])
+
+def _shared_arrays(shared: SharedMemory, shape: list) -> Tuple[np.ndarray, np.ndarray]:
+    n_fitness = int(np.prod(shape[:2]))
+    fitness = np.ndarray(shape[:2], dtype=float, buffer=shared.buf)
+    populations = np.ndarray(shape, dtype=np.uint8, buffer=shared.buf, offset=n_fitness * np.dtype(float).itemsize)
+    return populations, fitness
+
+def _fitness_or_nan(island: GeneticAlgorithm) -> np.ndarray:
+    if island.last_generation_fitness is None:
+        return np.full(len(island.population), np.nan)
+    return island.last_generation_fitness
\ No newline at end of file
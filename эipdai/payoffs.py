@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import itertools
+import numpy as np
+from concurrent.futures import Executor
+from .common import N_PLAYERS, PAYOFF_MATRIX
+from .environment import IPDGame
+from .strategies import Strategy
+from .tournament import play_triples
+from typing import Dict, List
+
+class PayoffStore:
+    '''
+    On-disk store of expected payoff tensors.
+
+    tensor[i, j, k] is the expected return of strategy i playing against strategies j and k. 
+    Tensors are kept in one .npz file per set of game parameters and indexed by strategy identities, 
+    so adding strategies to a pool only plays the games involving new strategies.
+    The number of games behind every entry is stored too, entries estimated from fewer games 
+    than requested are played again.
+    '''
+    def __init__(self, directory: str) -> None:
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, environment: IPDGame) -> str:
+        key = json.dumps({
+            'min_rounds': environment.min_rounds,
+            'max_rounds': environment.max_rounds,
+            'payoff_matrix': PAYOFF_MATRIX.tolist()
+        })
+        return os.path.join(self._directory, f'{hashlib.sha1(key.encode()).hexdigest()[:16]}.npz')
+
+    def load(self, environment: IPDGame) -> tuple[List[str], np.ndarray, np.ndarray]:
+        '''
+        Returns identities of stored strategies, their payoff tensor and the number of games per entry.
+        '''
+        path = self.path(environment)
+        if not os.path.exists(path):
+            return [], np.zeros([0, 0, 0]), np.zeros([0, 0, 0], dtype=int)
+
+        with np.load(path) as data:
+            # Files without game counts are treated as stale
+            n_runs = data['n_runs'] if 'n_runs' in data else np.zeros(data['tensor'].shape, dtype=int)
+            return list(data['identities']), data['tensor'], n_runs
+
+    def tensor(
+        self,
+        environment: IPDGame,
+        players: List[Strategy],
+        n_runs: int,
+        n_workers: int=None,
+        executor: Executor=None,
+        seed: int=None
+    ) -> np.ndarray:
+        '''
+        Returns the payoff tensor of players, playing and storing only the triples missing from the store.
+
+        Args:
+            environment: game environment
+            players: strategies of the pool
+            n_runs: number of games per triple with stochastic players
+            n_workers: number of worker processes, games are played in this process if not set
+            executor: executor to play games in, overrides n_workers
+            seed: master seed of the new games
+
+        Returns: array of shape (len(players), len(players), len(players))
+        '''
+        identities, stored, stored_runs = self.load(environment)
+
+        for player in players:
+            if player.identity not in identities:
+                identities.append(player.identity)
+
+        index = [identities.index(player.identity) for player in players]
+
+        known = np.full([len(identities)] * N_PLAYERS, np.nan)
+        known_runs = np.zeros(known.shape, dtype=int)
+        known[:len(stored), :len(stored), :len(stored)] = stored
+        known_runs[:len(stored), :len(stored), :len(stored)] = stored_runs
+
+        # Entries of the pool estimated from fewer games are played again
+        pool_entries = np.zeros(known.shape, dtype=bool)
+        pool_entries[np.ix_(index, index, index)] = True
+        known[pool_entries & (known_runs < n_runs)] = np.nan
+
+        if np.isnan(known[pool_entries]).any():
+            pool = [None] * len(identities)
+            for i, player in zip(index, players):
+                pool[i] = player
+
+            missing = np.isnan(known)
+            known = payoff_tensor(environment, pool, n_runs, n_workers, executor, seed, known)
+            known_runs[missing & ~np.isnan(known)] = n_runs
+
+            self.save(environment, identities, known, known_runs)
+
+        return known[np.ix_(index, index, index)]
+
+    def save(self, environment: IPDGame, identities: List[str], tensor: np.ndarray, n_runs: np.ndarray) -> None:
+        path = self.path(environment)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, identities=np.array(identities), tensor=tensor, n_runs=n_runs)
+        os.replace(tmp_path, path)
+
+def payoff_tensor(
+        environment: IPDGame,
+        players: List[Strategy],
+        n_runs: int,
+        n_workers: int=None,
+        executor: Executor=None,
+        seed: int=None,
+        known: np.ndarray=None
+    ) -> np.ndarray:
+    '''
+    Computes the expected payoff tensor of players. A roster fills the entries of its three rotations, 
+    so every multiset of three distinct players is played in both cyclic seat orders, (i, j, k) and (i, k, j), 
+    and multisets with a repeated player, whose rotations cover all orders, in one.
+
+    Args:
+        environment: game environment
+        players: strategies of the pool, None for strategies that are not available
+        n_runs: number of games per triple with stochastic players
+        n_workers: number of worker processes, games are played in this process if not set
+        executor: executor to play games in, overrides n_workers
+        seed: master seed
+        known: already computed entries, only triples with NaN entries are played
+
+    Returns: array of shape (len(players), len(players), len(players)), 
+             triples with unavailable players are NaN unless known
+    '''
+    tensor = np.full([len(players)] * N_PLAYERS, np.nan) if known is None else known.copy()
+
+    triples = [
+        list(roster)
+        for i, j, k in itertools.combinations_with_replacement(range(len(players)), N_PLAYERS)
+        for roster in ([(i, j, k), (i, k, j)] if i < j < k else [(i, j, k)])
+        if all(players[p] is not None for p in roster) and any(np.isnan(tensor[_rotations(roster)]))
+    ]
+
+    returns = play_triples(environment, players, triples, n_runs, n_workers, executor, seed)
+
+    # Seats of a roster with a repeated player can share an entry, they are averaged
+    totals = np.zeros(tensor.shape)
+    counts = np.zeros(tensor.shape, dtype=int)
+    for roster, roster_returns in zip(triples, returns):
+        np.add.at(totals, _rotations(roster), roster_returns)
+        np.add.at(counts, _rotations(roster), 1)
+
+    played = counts > 0
+    tensor[played] = totals[played] / counts[played]
+
+    return tensor
+
+def _rotations(roster: List[int]) -> tuple:
+    '''
+    Tensor indices of the seats of a roster, the player of seat s faces seats s + 1 and s + 2.
+    '''
+    return tuple(np.array([np.roll(roster, -seat) for seat in range(N_PLAYERS)]).T)
+
+def rank_by_payoffs(
+        tensor: np.ndarray,
+        players: List[Strategy]
+    ) -> Dict[str, float]:
+    '''
+    Ranks players by mean expected return over all pairs of distinct other players, 
+    as in the exhaustive tournament mode.
+    '''
+    n_players = len(players)
+    distinct = ~np.eye(n_players, dtype=bool)
+    mask = distinct[:, :, None] & distinct[:, None, :] & distinct[None, :, :]
+
+    results = (tensor * mask).sum(axis=(1, 2)) / mask.sum(axis=(1, 2))
+
+    return {players[i].name : results[i] for i in np.argsort(results)}
@@ -1,4 +1,9 @@
 from .base import *
 from .baselines import *
+from .automaton import *
 from .genetic import *
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+from .history import HistoryPolicy, FullHistory, SlidingWindow, RollingSummary
+from .batching import BatchingCoordinator
 from .llm import LLMStrategy
\ No newline at end of file
@@ -0,0 +1,181 @@
+import copy
+import functools
+import numpy as np
+from .base import Strategy
+from ..common import Actions, N_OUTCOMES, N_PLAYERS
+from typing import Tuple
+
+# Outcome of a round from the point of view of a player, own move * 1 + first opponent * 2 + second opponent * 4
+OUTCOME_COEF = np.array([2**i for i in range(N_PLAYERS)])
+
+def table_step(
+        actions: np.ndarray,
+        transitions: np.ndarray,
+        states: np.ndarray,
+        outcomes: np.ndarray=None,
+        tables: np.ndarray=None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Table lookup kernel shared by compiled automata and GeneticStrategy genotypes,
+    advances a batch of automata by their last outcomes and looks up their next actions.
+
+    Args:
+        actions: action of every state, shape (n_states,) or (n_tables, n_states) with tables
+        transitions: next state of every state and outcome, shape (n_states, N_OUTCOMES)
+        states: current states, shape (n,)
+        outcomes: last outcome of every automaton, None in the first round
+        tables: row of actions of every automaton
+
+    Returns: new states and actions
+    '''
+    if outcomes is not None:
+        states = transitions[states, outcomes]
+
+    if tables is None:
+        return states, actions[states]
+
+    return states, actions[tables, states]
+
+class Automaton(Strategy):
+    '''
+    Finite automaton playing by table lookup, state 0 is the initial state.
+    Usually obtained from a deterministic strategy by compile_strategy.
+    '''
+    deterministic = True
+
+    def __init__(
+        self,
+        actions: np.ndarray,
+        transitions: np.ndarray,
+        name: str=None,
+        identity: str=None
+    ):
+        '''
+        Args:
+            actions: action of every state, shape (n_states,)
+            transitions: next state of every state and outcome, shape (n_states, N_OUTCOMES)
+            name: strategy name
+            identity: identity of the compiled strategy, automata play exactly like it
+        '''
+        super().__init__(name)
+        self.actions = np.asarray(actions, dtype=np.int8)
+        self.transitions = np.asarray(transitions, dtype=np.int32)
+        self._identity = identity
+
+    @property
+    def n_states(self) -> int:
+        return len(self.actions)
+
+    @property
+    def identity(self) -> str:
+        return self._identity if self._identity is not None else super().identity
+
+    def play(
+        self,
+        observation: np.array,
+        reward: int=None
+    ) -> Actions:
+
+        if self._rounds_played > 0:
+            self._state = self.transitions[self._state, OUTCOME_COEF @ observation[:, -1]]
+        self._rounds_played += 1
+
+        return int(self.actions[self._state])
+
+    def reset(self):
+        super().reset()
+        self._state = 0
+
+    def state(self):
+        return self._state
+
+def compile_strategy(
+        strategy: Strategy,
+        max_rounds: int=None,
+        max_states: int=100000
+    ) -> Automaton:
+    '''
+    Compiles a deterministic strategy into an equivalent Automaton.
+
+    Histories are explored breadth first from a fresh copy of the strategy, two histories lead to
+    the same automaton state if the strategy has equal state() and equal last memory_depth rounds.
+    Strategies that already are table automata, such as GeneticStrategy, return them through automaton() instead.
+
+    Args:
+        strategy: deterministic strategy
+        max_rounds: only histories of up to max_rounds rounds are explored,
+                    strategies with unbounded state then compile to automata valid for games of up to max_rounds
+        max_states: raises ValueError if the automaton would have more states
+
+    Returns: automaton playing like strategy
+    '''
+    if not strategy.deterministic:
+        raise ValueError(f'{strategy.name} is not deterministic')
+
+    if hasattr(strategy, 'automaton'):
+        automaton = strategy.automaton()
+        if automaton.n_states > max_states:
+            raise ValueError(f'{strategy.name} has more than {max_states} states')
+        return automaton
+
+    player = copy.deepcopy(strategy)
+    player.reset()
+    window = np.full([N_PLAYERS, strategy.memory_depth], Actions.N.value)
+
+    keys = {(player.state(), window.tobytes()): 0}
+    queue = [(player, window, 0)]
+    actions = []
+    transitions = []
+
+    for player, window, depth in queue:
+        observation = window.copy()
+        observation.flags.writeable = False
+        action = int(player.play(observation))
+        actions.append(action)
+
+        if max_rounds is not None and depth + 1 >= max_rounds:
+            # Never left within max_rounds rounds
+            transitions.append([len(transitions)] * N_OUTCOMES)
+            continue
+
+        next_states = []
+        for outcome in range(N_OUTCOMES):
+            moves = outcome // OUTCOME_COEF % 2
+            # Outcomes with another own move than the strategy's cannot happen, they share the actual move's state
+            moves[0] = action
+
+            next_player = copy.deepcopy(player)
+            next_window = np.concatenate([window, moves[:, None]], axis=1)[:, 1:]
+
+            key = (next_player.state(), next_window.tobytes())
+            if key not in keys:
+                if len(keys) >= max_states:
+                    raise ValueError(f'{strategy.name} has more than {max_states} states')
+                keys[key] = len(keys)
+                queue.append((next_player, next_window, depth + 1))
+            next_states.append(keys[key])
+
+        transitions.append(next_states)
+
+    return Automaton(actions, transitions, name=strategy.name, identity=strategy.identity)
+
+@functools.lru_cache(maxsize=None)
+def genetic_transitions(memory_len: int) -> np.ndarray:
+    '''
+    Transition table of GeneticStrategy genotypes, states are gene indices and the genotype is the action table.
+    '''
+    history_offsets = [sum([N_OUTCOMES ** i for i in range(k)]) for k in range(memory_len + 1)]
+    n_histories = N_OUTCOMES ** memory_len
+
+    transitions = []
+    for k in range(memory_len + 1):
+        for outcomes_idx in range(N_OUTCOMES ** k):
+            transitions.append([
+                history_offsets[min(k + 1, memory_len)] + (outcomes_idx * N_OUTCOMES + outcome) % n_histories
+                for outcome in range(N_OUTCOMES)
+            ])
+
+    transitions = np.array(transitions, dtype=np.int32)
+    transitions.flags.writeable = False
+
+    return transitions
\ No newline at end of file
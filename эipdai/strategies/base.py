@@ -1,11 +1,22 @@
+import random
 import numpy as np
 from abc import ABC, abstractmethod
+from typing import Hashable
 from ..common import Actions
 
 class Strategy(ABC):
     '''
     Base class for all strategies.
     '''
+    # Deterministic strategies always respond the same way to the same history
+    deterministic = False
+    # Number of most recent rounds of the observation a deterministic strategy reads
+    memory_depth = 1
+    # Incremented whenever the behaviour of the strategy changes, invalidates cached results
+    version = 1
+    # Source of randomness of stochastic strategies, the global random module unless seeded
+    _rng = random
+
     def __init__(self, name: str=None):
         self._name = name if name else self.__class__.__name__
 
@@ -13,6 +24,13 @@ class Strategy(ABC):
     def name(self):
         return self._name
 
+    @property
+    def identity(self) -> str:
+        '''
+        Identifies the behaviour of the strategy, strategies with equal identities play the same way.
+        '''
+        return f'{self.__class__.__module__}.{self.__class__.__qualname__}:{self.version}'
+
     @abstractmethod
     def play(
         self, 
@@ -29,5 +47,28 @@ class Strategy(ABC):
         Returns: action
         '''
 
+    async def aplay(
+        self, 
+        observation: np.array,
+        reward: int=None,
+    ) -> Actions:
+        '''
+        Asynchronous play, strategies waiting on external services override it, all others play synchronously.
+        '''
+        return self.play(observation, reward)
+
     def reset(self):
-        self._rounds_played = 0
\ No newline at end of file
+        self._rounds_played = 0
+
+    def seed(self, seed: int=None):
+        '''
+        Gives the strategy its own random stream, None returns to the global random module.
+        '''
+        self._rng = random if seed is None else random.Random(seed)
+
+    def state(self) -> Hashable:
+        '''
+        Returns internal state of a deterministic strategy. Equal states together with equal 
+        last memory_depth rounds of the observation must lead to equal future play.
+        '''
+        return self._rounds_played
\ No newline at end of file
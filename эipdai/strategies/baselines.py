@@ -1,4 +1,3 @@
-import random
 import numpy as np
 from enum import Enum
 from typing import List
@@ -9,25 +8,37 @@ class Naive(Strategy):
     '''
     Always cooperates.
     '''
+    deterministic = True
+    memory_depth = 0
+
     def play(
         self, 
         observation: np.array,
         reward: int=None
     ) -> Actions:
         return Actions.C
-    
+
+    def state(self):
+        return None
+
 
 class Defector(Strategy):
     '''
     Always defects.
     '''
+    deterministic = True
+    memory_depth = 0
+
     def play(
         self, 
         observation: np.array,
         reward: int=None
     ) -> Actions:
         return Actions.D
-    
+
+    def state(self):
+        return None
+
 
 class Random(Strategy):
     '''
@@ -38,7 +49,7 @@ class Random(Strategy):
         observation: np.array,
         reward: int=None
     ) -> Actions:
-        return random.randint(Actions.C, Actions.D)
+        return self._rng.randint(Actions.C, Actions.D)
 
 
 class SoftT4T(Strategy):
@@ -46,6 +57,8 @@ class SoftT4T(Strategy):
     Defects only if both of the opponents defected in the last move.
     Taken from: https://www.classes.cs.uchicago.edu/archive/1998/fall/CS105/Project/node6.html
     '''
+    deterministic = True
+
     def play(
         self, 
         observation=np.array,
@@ -60,13 +73,18 @@ class SoftT4T(Strategy):
         if observation[1][-1] == Actions.D and observation[2][-1] == Actions.D: return Actions.D
 
         return Actions.C
-    
+
+    def state(self):
+        return min(self._rounds_played, 1)
+
 
 class ToughT4T(Strategy):
     '''
     Defects if either of the opponents defected in the last move.
     Taken from: https://www.classes.cs.uchicago.edu/archive/1998/fall/CS105/Project/node6.html
     '''
+    deterministic = True
+
     def play(
         self, 
         observation: np.array,
@@ -81,10 +99,15 @@ class ToughT4T(Strategy):
         if observation[1][-1] == Actions.D or observation[2][-1] == Actions.D: return Actions.D
 
         return Actions.C
-    
+
+    def state(self):
+        return min(self._rounds_played, 1)
+
 
 class FairT4T(Strategy):
 
+    deterministic = True
+
     class Defector(Enum):
         BOTH = 0
         OPP1 = 1
@@ -134,10 +157,15 @@ class FairT4T(Strategy):
     def reset(self):
         super().reset()
         self._defector = None
-    
+
+    def state(self):
+        return min(self._rounds_played, 1), self._defector
+
 
 class DecayingT4T(FairT4T):
 
+    deterministic = False
+
     def __init__(self, name=None) -> None:
         super().__init__(name)
         self._rounds_of_decay = 200
@@ -151,7 +179,7 @@ class DecayingT4T(FairT4T):
         action = super().play(observation)
 
         if action == Actions.C:
-            if random.random() > max(
+            if self._rng.random() > max(
                 1 - self._end_coop_prob / self._rounds_of_decay * self._rounds_played, 
                 self._end_coop_prob
             ):
@@ -164,6 +192,8 @@ class GradualT4T(Strategy):
     '''
     Adapted from https://github.com/Axelrod-Python/Axelrod/blob/dev/axelrod/strategies/titfortat.py 
     '''
+    deterministic = True
+
     def play(
         self, 
         observation: np.array,
@@ -203,9 +233,21 @@ class GradualT4T(Strategy):
         self._punishment_count = 0
         self._punishment_limit = 0
 
+    def state(self):
+        return (
+            min(self._rounds_played, 1), 
+            self._calming, 
+            self._punishing, 
+            self._punishment_count, 
+            self._punishment_limit
+        )
+
 
 class SoftT42T(Strategy):
 
+    deterministic = True
+    memory_depth = 2
+
     def play(
         self, 
         observation: np.array,
@@ -228,9 +270,15 @@ class SoftT42T(Strategy):
 
         return action
 
+    def state(self):
+        return min(self._rounds_played, 2)
+
 
 class ToughT42T(Strategy):
 
+    deterministic = True
+    memory_depth = 2
+
     def play(
         self, 
         observation: np.array,
@@ -251,9 +299,14 @@ class ToughT42T(Strategy):
 
         return action
 
+    def state(self):
+        return min(self._rounds_played, 2)
+
 
 class AnotherT42T(Strategy):
 
+    deterministic = True
+
     def play(
         self, 
         observation: np.array,
@@ -279,12 +332,17 @@ class AnotherT42T(Strategy):
     def reset(self):
         super().reset()
         self._opp1_defection_count = self._opp2_defection_count = 0
-    
-    
+
+    def state(self):
+        return min(self._rounds_played, 1), self._opp1_defection_count, self._opp2_defection_count
+
+
 class SoftGrudger(Strategy):
     '''
     Adapted from https://github.com/Axelrod-Python/Axelrod/blob/dev/axelrod/strategies/grudger.py
     '''
+    deterministic = True
+
     def play(
         self, 
         observation: np.array,
@@ -307,11 +365,16 @@ class SoftGrudger(Strategy):
         super().reset()
         self._triggered = False
 
+    def state(self):
+        return min(self._rounds_played, 1), self._triggered
+
 
 class ToughGrudger(Strategy):
     '''
     Adapted from https://github.com/Axelrod-Python/Axelrod/blob/dev/axelrod/strategies/grudger.py
     '''
+    deterministic = True
+
     def play(
         self, 
         observation: np.array,
@@ -334,6 +397,9 @@ class ToughGrudger(Strategy):
         super().reset()
         self._triggered = False
 
+    def state(self):
+        return min(self._rounds_played, 1), self._triggered
+
 
 class Grofman(Strategy):
     '''
@@ -348,7 +414,7 @@ class Grofman(Strategy):
         if self._rounds_played == 0 or observation[0][-1] == observation[1][-1] == observation[2][-1]:
             action = Actions.C
         else:
-            action = int(random.random() > 2/7)
+            action = int(self._rng.random() > 2/7)
 
         self._rounds_played += 1
 
@@ -373,7 +439,7 @@ class Joss(Strategy):
         elif (observation[1][-1] == Actions.D or observation[2][-1] == Actions.D):
             action = Actions.D  
         else: 
-            action = int(random.random() < 0.1)
+            action = int(self._rng.random() < 0.1)
 
         return action
     
@@ -382,6 +448,8 @@ class Davis(Strategy):
     '''
     Adapted from https://github.com/Axelrod-Python/Axelrod/blob/dev/axelrod/strategies/axelrod_first.py FirstByDavis
     '''
+    deterministic = True
+
     def __init__(self, name=None) -> None:
         super().__init__(name)
         self._rounds_to_cooperate = 10
@@ -411,6 +479,9 @@ class Davis(Strategy):
         super().reset()
         self._triggered = False
 
+    def state(self):
+        return min(self._rounds_played, self._rounds_to_cooperate + 1), self._triggered
+
 
 class AverageCopier(Strategy):
     '''
@@ -425,10 +496,19 @@ class AverageCopier(Strategy):
         if self._rounds_played == 0: 
             action = Actions.C
         else:
-            opp1_p_coop = (self._rounds_played - sum(observation[1,:])) / self._rounds_played
-            opp2_p_coop = (self._rounds_played - sum(observation[2,:])) / self._rounds_played
-
-            action = int(random.random() < (opp1_p_coop + opp2_p_coop) / 2)
+            if getattr(observation, 'n_rounds', None) is None:
+                opp1_sum = sum(observation[1,:])
+                opp2_sum = sum(observation[2,:])
+            else:
+                # Sums over whole observation rows, the Actions.N padding of rounds not played yet counts as -1
+                padding = observation.shape[1] - observation.n_rounds
+                defections = observation.defections[:, -1]
+                opp1_sum = defections[1] - padding
+                opp2_sum = defections[2] - padding
+            opp1_p_coop = (self._rounds_played - opp1_sum) / self._rounds_played
+            opp2_p_coop = (self._rounds_played - opp2_sum) / self._rounds_played
+
+            action = int(self._rng.random() < (opp1_p_coop + opp2_p_coop) / 2)
     
         self._rounds_played += 1
 
@@ -437,6 +517,8 @@ class AverageCopier(Strategy):
 
 class Proposer(Strategy):
 
+    deterministic = True
+
     def play(
         self, 
         observation: np.array,
@@ -483,7 +565,7 @@ class Stalker(Strategy):
             elif avg_score > self._bad_score:
                 action = Actions.D
             else:
-                action = random.randint(Actions.C, Actions.D)
+                action = self._rng.randint(Actions.C, Actions.D)
         
         self._rounds_played += 1
 
@@ -503,7 +585,7 @@ class BetterAndBetter(Strategy):
         observation: np.array,
         reward: int=None
     ) -> Actions:
-        action = int(random.random() < self._rounds_played / 1000)
+        action = int(self._rng.random() < self._rounds_played / 1000)
 
         self._rounds_played += 1
 
@@ -514,6 +596,8 @@ class Shubik(Strategy):
     '''
     Adapted from https://github.com/Axelrod-Python/Axelrod/blob/dev/axelrod/strategies/axelrod_first.py FirstByShubik
     '''
+    deterministic = True
+
     def retaliate(self):
         self._retaliation_remaining -= 1
         if self._retaliation_remaining == 0: self._retaliating = False
@@ -546,6 +630,14 @@ class Shubik(Strategy):
         self._retaliation_length = 0
         self._retaliation_remaining = 0
 
+    def state(self):
+        return (
+            min(self._rounds_played, 1), 
+            self._retaliating, 
+            self._retaliation_length, 
+            self._retaliation_remaining
+        )
+
 
 class SoftTullock(Strategy):
     '''
@@ -564,11 +656,20 @@ class SoftTullock(Strategy):
         if self._rounds_played < self._rounds_to_coop:
             action = Actions.C
         else:
-            opp1_p_coop_10 = (self._rounds_to_coop - 1 - sum(observation[1, -self._rounds_to_coop + 1:])) / (self._rounds_to_coop - 1)
-            opp2_p_coop_10 = (self._rounds_to_coop - 1 - sum(observation[2, -self._rounds_to_coop + 1:])) / (self._rounds_to_coop - 1)
+            if getattr(observation, 'n_rounds', None) is None:
+                opp1_sum_10 = sum(observation[1, -self._rounds_to_coop + 1:])
+                opp2_sum_10 = sum(observation[2, -self._rounds_to_coop + 1:])
+            else:
+                # Sums over the last 10 columns, Actions.N padding of rounds not played yet counts as -1
+                padding_10 = max(0, self._rounds_to_coop - 1 - observation.n_rounds)
+                defections = observation.defections
+                opp1_sum_10 = defections[1, -1] - defections[1, -self._rounds_to_coop] - padding_10
+                opp2_sum_10 = defections[2, -1] - defections[2, -self._rounds_to_coop] - padding_10
+            opp1_p_coop_10 = (self._rounds_to_coop - 1 - opp1_sum_10) / (self._rounds_to_coop - 1)
+            opp2_p_coop_10 = (self._rounds_to_coop - 1 - opp2_sum_10) / (self._rounds_to_coop - 1)
             p_coop = max(0, (opp1_p_coop_10 + opp2_p_coop_10) / 2 - 0.1)
 
-            action = int(random.random() > p_coop)
+            action = int(self._rng.random() > p_coop)
 
         self._rounds_played += 1
 
@@ -592,11 +693,20 @@ class ToughTullock(Strategy):
         if self._rounds_played < self._rounds_to_coop: 
             action = Actions.C
         else:
-            opp1_p_coop_10 = (self._rounds_to_coop - 1 - sum(observation[1, -self._rounds_to_coop + 1:])) / (self._rounds_to_coop - 1)
-            opp2_p_coop_10 = (self._rounds_to_coop - 1 - sum(observation[2, -self._rounds_to_coop + 1:])) / (self._rounds_to_coop - 1)
+            if getattr(observation, 'n_rounds', None) is None:
+                opp1_sum_10 = sum(observation[1, -self._rounds_to_coop + 1:])
+                opp2_sum_10 = sum(observation[2, -self._rounds_to_coop + 1:])
+            else:
+                # Sums over the last 10 columns, Actions.N padding of rounds not played yet counts as -1
+                padding_10 = max(0, self._rounds_to_coop - 1 - observation.n_rounds)
+                defections = observation.defections
+                opp1_sum_10 = defections[1, -1] - defections[1, -self._rounds_to_coop] - padding_10
+                opp2_sum_10 = defections[2, -1] - defections[2, -self._rounds_to_coop] - padding_10
+            opp1_p_coop_10 = (self._rounds_to_coop - 1 - opp1_sum_10) / (self._rounds_to_coop - 1)
+            opp2_p_coop_10 = (self._rounds_to_coop - 1 - opp2_sum_10) / (self._rounds_to_coop - 1)
             p_coop = max(0, min(opp1_p_coop_10, opp2_p_coop_10) - 0.1)
 
-            action = int(random.random() > p_coop)
+            action = int(self._rng.random() > p_coop)
         
         self._rounds_played += 1
 
@@ -0,0 +1,77 @@
+import asyncio
+from langchain.schema import BaseMessage
+from langchain.chat_models.base import BaseChatModel
+from typing import List
+
+class BatchingCoordinator:
+    '''
+    Collects the model requests of LLMStrategy players awaiting aplay and sends them as one batched generate call.
+
+    A batch is sent when max_batch_size requests are pending or max_wait seconds after its first request.
+    Every conversation gets its own response or exception back, so retries and fallbacks stay per conversation.
+    '''
+    def __init__(
+        self,
+        model: BaseChatModel,
+        max_batch_size: int=32,
+        max_wait: float=0.01
+    ) -> None:
+        '''
+        Args:
+            model: chat model shared by all players using the coordinator
+            max_batch_size: maximum number of conversations per generate call
+            max_wait: longest time in seconds a request waits for others
+        '''
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.n_batches = 0
+        self.n_requests = 0
+
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, messages: List[BaseMessage]) -> BaseMessage:
+        '''
+        Returns the model response to messages, sent with the other requests of its batch.
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((messages, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch: return
+
+        task = asyncio.ensure_future(self._generate(batch))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _generate(self, batch: list) -> None:
+        self.n_batches += 1
+        self.n_requests += len(batch)
+
+        try:
+            result = await self.model.agenerate([messages for messages, future in batch])
+        except Exception as e:
+            for messages, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (messages, future), generations in zip(batch, result.generations):
+            if not future.done():
+                future.set_result(generations[0].message)
\ No newline at end of file
@@ -1,34 +1,114 @@
 import random
+import hashlib
+import functools
 import itertools
 import numpy as np
 from .base import Strategy
+from .automaton import OUTCOME_COEF, Automaton, genetic_transitions
 from ..common import Actions, N_OUTCOMES, N_PLAYERS
-from typing import List
+from typing import List, Tuple
+
+# Outcome bits are own move * 1 + first opponent * 2 + second opponent * 4, 
+# swapping the opponents exchanges the last two bits
+_SWAPPED_OUTCOMES = np.array([(o & 1) | (o & 2) << 1 | (o & 4) >> 1 for o in range(N_OUTCOMES)])
+
+@functools.lru_cache(maxsize=None)
+def _canonical_encoding(memory_len: int) -> Tuple[np.ndarray, np.ndarray]:
+    index_map = []
+    representatives = []
+    offset = 0
+    full_offset = 0
+    for k in range(memory_len + 1):
+        histories = np.arange(N_OUTCOMES ** k)
+        swapped = np.zeros_like(histories)
+        for digit in range(k):
+            outcomes = histories // N_OUTCOMES ** digit % N_OUTCOMES
+            swapped += _SWAPPED_OUTCOMES[outcomes] * N_OUTCOMES ** digit
+
+        # The smaller of a history and its swap represents both
+        canonical, first, inverse = np.unique(np.minimum(histories, swapped), return_index=True, return_inverse=True)
+        index_map.append(offset + inverse)
+        representatives.append(full_offset + first)
+
+        offset += len(canonical)
+        full_offset += len(histories)
+
+    index_map, representatives = np.concatenate(index_map), np.concatenate(representatives)
+    index_map.flags.writeable = representatives.flags.writeable = False
+
+    return index_map, representatives
+
+def canonical_index_map(memory_len: int) -> np.ndarray:
+    '''
+    Canonical gene of every gene of the full encoding. 
+
+    The canonical encoding keeps one gene per pair of histories that only differ by swapping the opponents,
+    so canonical genotypes describe strategies that treat both opponents alike.
+    '''
+    return _canonical_encoding(memory_len)[0]
+
+def to_canonical(genotype: np.ndarray, memory_len: int) -> np.ndarray:
+    '''
+    Converts full genotypes, shape (..., genotype_len), to the canonical encoding. 
+    Of two swapped histories the gene of the smaller history index is kept.
+    '''
+    return np.asarray(genotype)[..., _canonical_encoding(memory_len)[1]]
+
+def from_canonical(genotype: np.ndarray, memory_len: int) -> np.ndarray:
+    '''
+    Converts canonical genotypes, shape (..., canonical_genotype_len), to the full encoding.
+    '''
+    return np.asarray(genotype)[..., _canonical_encoding(memory_len)[0]]
 
 class GeneticStrategy(Strategy):
 
+    deterministic = True
+
     def __init__(
         self, 
         memory_len: int,
         genotype: List[int]=None,
         name: str=None,
+        canonical: bool=False
     ):
+        '''
+        Args:
+            memory_len: number of past rounds the strategy looks at
+            genotype: action of every history, random if not given
+            name: strategy name
+            canonical: genotype is in the canonical encoding, see canonical_index_map
+        '''
         super().__init__(name)
 
         self._memory_len = memory_len
+        self._canonical = canonical
 
-        self._outcomes_coef = np.array([N_OUTCOMES**i for i in range(memory_len-1,-1,-1)])
-        self._moves_coef = np.array([2**i for i in range(0,N_PLAYERS)])
+        # Gene of the current history is the state of an automaton, see genetic_transitions
+        self._transitions = genetic_transitions(memory_len)
 
         if genotype is None:
             genotype_len = sum([N_OUTCOMES ** i for i in range(memory_len, -1, -1)])
+            if canonical:
+                genotype_len = len(to_canonical(np.zeros(genotype_len), memory_len))
             self._genotype = [random.randint(Actions.C, Actions.D) for _ in range(genotype_len)]
         else:
             self._genotype = genotype
 
+        self._genes = np.asarray(self._genotype, dtype=np.int8)
+        if canonical:
+            # Playing always looks genes up in the full encoding
+            self._genes = from_canonical(self._genes, memory_len)
+
+        self._rounds_played = 0
+        self._gene_idx = 0
+
     @property
     def genotype(self):
         return self._genotype
+
+    @property
+    def identity(self) -> str:
+        return f'{super().identity}:{self._memory_len}:{hashlib.sha1(self._genes.tobytes()).hexdigest()}'
     
     def play(
         self, 
@@ -36,26 +116,35 @@ class GeneticStrategy(Strategy):
         reward: int = None
     ) -> Actions:
         
-        obs_trimmed = observation[:, -self._memory_len:]
-        obs_masked = np.ma.masked_array(obs_trimmed, obs_trimmed<0)
+        if self._rounds_played > 0:
+            self._gene_idx = self._transitions[self._gene_idx, OUTCOME_COEF @ observation[:, -1]]
+        self._rounds_played += 1
 
-        no_history_offset = ((obs_masked>=0).any(axis=0) * self._outcomes_coef).sum()
+        return int(self._genes[self._gene_idx])
 
-        gene_idx = ((obs_masked * self._moves_coef[:, None]).sum(axis=0) * self._outcomes_coef).sum() + no_history_offset
-        if type(gene_idx) is np.ma.core.MaskedConstant:
-            gene_idx = 0
+    def reset(self):
+        super().reset()
+        self._gene_idx = 0
 
-        return self._genotype[gene_idx]
+    def state(self):
+        return self._gene_idx
+
+    def automaton(self) -> Automaton:
+        '''
+        Returns the genotype as an Automaton, its states are the gene indices, see genetic_transitions.
+        '''
+        return Automaton(self._genes, self._transitions, name=self.name, identity=self.identity)
 
     def __str__(self) -> str:
+        histories = list(itertools.chain.from_iterable([['Start']] + [[
+            list(map(lambda y: str(bin(int(y)))[2:].rjust(N_PLAYERS, '0'), list(str(oct(x))[2:].rjust(i, '0')))) 
+                for x in list(range(N_OUTCOMES**i))
+            ] for i in range(1,self._memory_len+1)
+        ]))
+        if self._canonical:
+            histories = [histories[i] for i in _canonical_encoding(self._memory_len)[1]]
+
         return '\n'.join(list(map(
             lambda gene: str(gene),
-            zip(
-                itertools.chain.from_iterable([['Start']] + [[
-                    list(map(lambda y: str(bin(int(y)))[2:].rjust(N_PLAYERS, '0'), list(str(oct(x))[2:].rjust(i, '0')))) 
-                        for x in list(range(N_OUTCOMES**i))
-                    ] for i in range(1,self._memory_len+1)
-                ]),
-                self._genotype
-            )
+            zip(histories, self._genotype)
         )))
\ No newline at end of file
@@ -0,0 +1,90 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from langchain.schema import BaseMessage, HumanMessage
+from ..common import Actions
+from typing import List
+
+class HistoryPolicy(ABC):
+    '''
+    Chooses the messages LLMStrategy sends to its model out of the full conversation.
+    '''
+    @abstractmethod
+    def context(
+        self,
+        history: List[BaseMessage],
+        observation: np.ndarray,
+        total_return: int
+    ) -> List[BaseMessage]:
+        '''
+        Args:
+            history: full conversation, the system message first and the current observation message last
+            observation: current observation
+            total_return: return of the strategy so far
+
+        Returns: messages to send
+        '''
+
+class FullHistory(HistoryPolicy):
+    '''
+    Sends the whole conversation, prompts grow with every round.
+    '''
+    def context(
+        self,
+        history: List[BaseMessage],
+        observation: np.ndarray,
+        total_return: int
+    ) -> List[BaseMessage]:
+        return history
+
+    def __str__(self) -> str:
+        return 'full'
+
+class SlidingWindow(HistoryPolicy):
+    '''
+    Sends the system message, the last n_exchanges observations and answers and the current observation.
+    '''
+    def __init__(self, n_exchanges: int) -> None:
+        self.n_exchanges = n_exchanges
+
+    def context(
+        self,
+        history: List[BaseMessage],
+        observation: np.ndarray,
+        total_return: int
+    ) -> List[BaseMessage]:
+        return history[:1] + history[max(1, len(history) - 2 * self.n_exchanges - 1):]
+
+    def __str__(self) -> str:
+        return f'window={self.n_exchanges}'
+
+class RollingSummary(SlidingWindow):
+    '''
+    Like SlidingWindow, with a message summarizing the whole game so far before the window.
+    The summary is computed from the observation, cooperation rates of every player and the return.
+    '''
+    def __init__(self, n_exchanges: int=1) -> None:
+        super().__init__(n_exchanges)
+
+    def context(
+        self,
+        history: List[BaseMessage],
+        observation: np.ndarray,
+        total_return: int
+    ) -> List[BaseMessage]:
+        window = super().context(history, observation, total_return)
+
+        n_rounds = int((observation[0] != Actions.N).sum())
+        if n_rounds == 0:
+            return window
+
+        cooperation_rates = (observation == Actions.C).sum(axis=1) / n_rounds
+        summary = '\n'.join(
+            ['Summary of the game so far', f'Rounds played: {n_rounds}', f'Your cooperation rate: {cooperation_rates[0]:.2f}'] +
+            [f'Cooperation rate of opponent {k}: {rate:.2f}' for k, rate in enumerate(cooperation_rates[1:], 1)] +
+            [f'Return: {total_return}']
+        )
+
+        return window[:1] + [HumanMessage(content=summary)] + window[1:]
+
+    def __str__(self) -> str:
+        return f'summary+window={self.n_exchanges}'
\ No newline at end of file
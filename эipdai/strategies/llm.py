@@ -1,12 +1,17 @@
-import random
+import json
+import hashlib
 import numpy as np
 import tenacity
 from langchain.output_parsers import RegexParser
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from langchain.chat_models.base import BaseChatModel
 from .base import Strategy
+from .rate_limiter import RateLimiter, is_rate_limit_error
+from .response_cache import ResponseCache, response_key
+from .history import HistoryPolicy, FullHistory
+from .batching import BatchingCoordinator
 from ..common import Actions
-from typing import Callable
+from typing import Callable, List
 
 class LLMStrategy(Strategy):
 
@@ -16,12 +21,36 @@ class LLMStrategy(Strategy):
         instructions: str,
         obs_preprocessor: Callable,
         name: str = None,
+        rate_limiter: RateLimiter = None,
+        cache: ResponseCache = None,
+        history_policy: HistoryPolicy = None,
+        batcher: BatchingCoordinator = None,
     ):
+        '''
+        Args:
+            model: chat model
+            instructions: system message
+            obs_preprocessor: turns observations into the text shown to the model
+            name: strategy name, defaults to the class name and the history policy if it is not FullHistory
+            rate_limiter: request and token budget, usually shared by all strategies using the same account
+            cache: responses are looked up there before querying the model and stored after
+            history_policy: messages of the conversation sent to the model, FullHistory by default
+            batcher: aplay sends requests through it batched with those of other players, play calls the model directly
+        '''
+        if batcher is not None and batcher.model is not model:
+            raise ValueError('The batching coordinator has to use the same model')
+
+        self._history_policy = history_policy if history_policy is not None else FullHistory()
+        if name is None and not isinstance(self._history_policy, FullHistory):
+            name = f'{self.__class__.__name__}[{self._history_policy}]'
         super().__init__(name)
 
         self._model = model
         self._instructions = instructions
         self._obs_preprocessor = obs_preprocessor
+        self._rate_limiter = rate_limiter
+        self._cache = cache
+        self._batcher = batcher
 
         self._action_parser = RegexParser(
             regex=r"Action: (.*)", output_keys=["action"], default_output_key="action"
@@ -29,12 +58,128 @@ class LLMStrategy(Strategy):
 
         self._instructions
 
+    @property
+    def identity(self) -> str:
+        model_id = f'{self._model.__class__.__qualname__}:{getattr(self._model, "model_name", "")}'
+        return f'{super().identity}:{model_id}:{hashlib.sha1(self._instructions.encode()).hexdigest()}:{self._history_policy}'
+
+    @property
+    def history_policy(self) -> HistoryPolicy:
+        return self._history_policy
+
     def play(
         self, 
         observation: np.array, 
         reward: int = None
     ) -> Actions:
+        self._observe(observation, reward)
+
+        try:
+            for attempt in tenacity.Retrying(**self._retry_kwargs()):
+                with attempt:
+                    act_message = self._invoke()
+                    action = self._act(act_message)
+        
+        except tenacity.RetryError as e:
+            action = self._rng.randint(Actions.C, Actions.D)
+
+        return action
+
+    async def aplay(
+        self, 
+        observation: np.array, 
+        reward: int = None
+    ) -> Actions:
+        '''
+        Same as play, awaits the chat model instead of blocking so that many games can wait on it at once.
+        '''
+        self._observe(observation, reward)
+
+        try:
+            async for attempt in tenacity.AsyncRetrying(**self._retry_kwargs()):
+                with attempt:
+                    act_message = await self._ainvoke()
+                    action = self._act(act_message)
+
+        except tenacity.RetryError as e:
+            action = self._rng.randint(Actions.C, Actions.D)
+
+        return action
+
+    def _invoke(self) -> BaseMessage:
+        messages = self._history_policy.context(self._message_history, self._observation, self._return)
+        key = self._cache_key(messages)
+        if key is not None and (content := self._cache.get(key)) is not None:
+            return AIMessage(content=content)
+
+        while True:
+            n_tokens = self._estimate_tokens(messages)
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(n_tokens)
+            try:
+                act_message = self._model(messages)
+            except Exception as e:
+                if self._should_retry(e): continue
+                raise
+
+            self._settle(act_message, n_tokens, key)
+            return act_message
+
+    async def _ainvoke(self) -> BaseMessage:
+        messages = self._history_policy.context(self._message_history, self._observation, self._return)
+        key = self._cache_key(messages)
+        if key is not None and (content := self._cache.get(key)) is not None:
+            return AIMessage(content=content)
+
+        while True:
+            n_tokens = self._estimate_tokens(messages)
+            if self._rate_limiter is not None:
+                await self._rate_limiter.aacquire(n_tokens)
+            try:
+                if self._batcher is not None:
+                    act_message = await self._batcher.submit(messages)
+                else:
+                    act_message = await self._model.ainvoke(messages)
+            except Exception as e:
+                if self._should_retry(e): continue
+                raise
+
+            self._settle(act_message, n_tokens, key)
+            return act_message
+
+    def _should_retry(self, exception: Exception) -> bool:
+        '''
+        Rate limit errors pause the shared limiter and are retried until it gives up.
+        '''
+        return self._rate_limiter is not None and is_rate_limit_error(exception) and self._rate_limiter.backoff()
+
+    def _estimate_tokens(self, messages: List[BaseMessage]) -> int:
+        # About 4 characters per token and a short answer
+        return sum(len(message.content) for message in messages) // 4 + 16
+
+    def _cache_key(self, messages: List[BaseMessage]) -> str:
+        if self._cache is None: return None
+
+        # Sampling parameters are part of the key, a response at another temperature is not a replay
+        params = json.dumps(getattr(self._model, '_identifying_params', {}), sort_keys=True, default=str)
+        model_id = f'{self._model.__class__.__qualname__}:{params}'
+
+        return response_key(model_id, [(message.type, message.content) for message in messages])
+
+    def _settle(self, act_message: BaseMessage, n_tokens: int, key: str) -> None:
+        if key is not None:
+            self._cache.put(key, act_message.content)
+
+        if self._rate_limiter is None: return
+
+        self._rate_limiter.succeed()
+        usage = getattr(act_message, 'usage_metadata', None)
+        if usage:
+            self._rate_limiter.consume(usage['total_tokens'] - n_tokens)
+
+    def _observe(self, observation: np.array, reward: int) -> None:
         obs = self._obs_preprocessor(observation)
+        self._observation = observation
 
         if reward is not None:
             self._return += reward 
@@ -47,24 +192,18 @@ class LLMStrategy(Strategy):
 
         self._message_history.append(HumanMessage(content=obs_message))
 
-        try:
-            for attempt in tenacity.Retrying(
-                stop=tenacity.stop_after_attempt(2),
-                wait=tenacity.wait_fixed(1),
-                retry=tenacity.retry_if_exception_type(ValueError),
-                before_sleep=lambda retry_state: print(
-                    f'ValueError occurred: {retry_state.outcome.exception()}, retrying...'
-                ),
-            ):
-                with attempt:
-                    act_message = self._model(self._message_history)
-                    self._message_history.append(act_message)
-                    action = int(self._action_parser.parse(act_message.content)["action"])
-        
-        except tenacity.RetryError as e:
-            action = random.randint(Actions.C, Actions.D)
+    def _act(self, act_message: BaseMessage) -> Actions:
+        self._message_history.append(act_message)
+        return int(self._action_parser.parse(act_message.content)["action"])
 
-        return action
+    def _retry_kwargs(self) -> dict:
+        return dict(
+            stop=tenacity.stop_after_attempt(2),
+            retry=tenacity.retry_if_exception_type(ValueError),
+            before_sleep=lambda retry_state: print(
+                f'ValueError occurred: {retry_state.outcome.exception()}, retrying...'
+            ),
+        )
 
     def reset(self):
         super().reset()
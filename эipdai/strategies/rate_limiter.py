@@ -0,0 +1,129 @@
+import time
+import asyncio
+import threading
+
+class RateLimiter:
+    '''
+    Token bucket limiter of requests and tokens per minute, shared by all LLM strategies of a process that use
+    the same provider account. Buckets hold up to one minute of budget and refill continuously.
+
+    Rate limit errors pause all callers, the pause doubles on consecutive errors and is reset by a success.
+    '''
+    def __init__(
+        self,
+        requests_per_minute: float=None,
+        tokens_per_minute: float=None,
+        initial_backoff: float=1.0,
+        max_backoff: float=60.0,
+        max_retries: int=8
+    ) -> None:
+        '''
+        Args:
+            requests_per_minute: request budget, unlimited if not given
+            tokens_per_minute: token budget, unlimited if not given
+            initial_backoff: pause in seconds after a first rate limit error
+            max_backoff: longest pause in seconds
+            max_retries: number of consecutive rate limit errors after which callers give up
+        '''
+        self._rates = [
+            None if requests_per_minute is None else requests_per_minute / 60,
+            None if tokens_per_minute is None else tokens_per_minute / 60
+        ]
+        self._capacities = [requests_per_minute, tokens_per_minute]
+        self._levels = [requests_per_minute, tokens_per_minute]
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self.max_retries = max_retries
+
+        self._lock = threading.Lock()
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._n_failures = 0
+
+    def acquire(self, n_tokens: int=0) -> None:
+        '''
+        Blocks until a request with n_tokens fits the budget and takes it.
+        '''
+        while (delay := self._reserve(n_tokens)) > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, n_tokens: int=0) -> None:
+        '''
+        Waits until a request with n_tokens fits the budget and takes it, without blocking the event loop.
+        '''
+        while (delay := self._reserve(n_tokens)) > 0:
+            await asyncio.sleep(delay)
+
+    def consume(self, n_tokens: int) -> None:
+        '''
+        Charges tokens used beyond the estimate passed to acquire, negative values give tokens back.
+        '''
+        with self._lock:
+            self._refill()
+            if self._levels[1] is not None:
+                self._levels[1] = min(self._levels[1] - n_tokens, self._capacities[1])
+
+    def backoff(self) -> bool:
+        '''
+        Pauses all callers after a rate limit error.
+
+        Returns: whether the request should be retried
+        '''
+        with self._lock:
+            now = time.monotonic()
+            # Errors of requests sent before the current pause belong to the same episode
+            if now < self._paused_until:
+                return self._n_failures <= self.max_retries
+
+            self._n_failures += 1
+            delay = min(self._initial_backoff * 2 ** (self._n_failures - 1), self._max_backoff)
+            self._paused_until = now + delay
+
+            return self._n_failures <= self.max_retries
+
+    def succeed(self) -> None:
+        with self._lock:
+            self._n_failures = 0
+
+    def _reserve(self, n_tokens: int) -> float:
+        '''
+        Takes one request and n_tokens if they fit, otherwise returns the time until they could.
+        '''
+        with self._lock:
+            now = self._refill()
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            amounts = [1, n_tokens]
+            delay = 0.0
+            for level, capacity, rate, amount in zip(self._levels, self._capacities, self._rates, amounts):
+                if rate is None: continue
+                # Requests larger than the whole bucket wait for a full bucket instead of forever
+                missing = min(amount, capacity) - level
+                if missing > 0:
+                    delay = max(delay, missing / rate)
+
+            if delay > 0:
+                return delay
+
+            for i, amount in enumerate(amounts):
+                if self._rates[i] is not None:
+                    self._levels[i] -= amount
+
+            return 0.0
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        for i, rate in enumerate(self._rates):
+            if rate is not None:
+                self._levels[i] = min(self._levels[i] + (now - self._updated) * rate, self._capacities[i])
+        self._updated = now
+
+        return now
+
+def is_rate_limit_error(exception: BaseException) -> bool:
+    '''
+    Recognizes rate limit errors of provider clients without importing them, by HTTP status 429 or class name.
+    '''
+    status = getattr(exception, 'status_code', None) or getattr(getattr(exception, 'response', None), 'status_code', None)
+    return status == 429 or 'RateLimit' in type(exception).__name__
\ No newline at end of file
@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import List, Tuple
+
+class ResponseCache:
+    '''
+    On-disk cache of chat model responses, keyed by the model and a hash of the messages sent to it.
+    Entries are evicted least recently used first once the cache holds more than max_entries.
+
+    One cache can be shared by several LLMStrategy players, also from threads.
+    '''
+    def __init__(
+        self,
+        path: str,
+        max_entries: int=None,
+        replay_only: bool=False
+    ) -> None:
+        '''
+        Args:
+            path: SQLite database file, created if missing, ':memory:' for a cache of this process only
+            max_entries: maximum number of stored responses, unbounded if not given
+            replay_only: misses raise KeyError instead of querying the model, for offline reruns and tests
+        '''
+        self.max_entries = max_entries
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # Recency of hits is written with the next insertion so that replays do not write to disk
+        self._touched = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT, last_used INTEGER)'
+        )
+        self._connection.commit()
+        self._clock = self._connection.execute('SELECT COALESCE(MAX(last_used), 0) FROM responses').fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def get(self, key: str) -> str:
+        '''
+        Returns the cached response content or None, raises KeyError on a miss in replay-only mode.
+        '''
+        with self._lock:
+            row = self._connection.execute('SELECT content FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.replay_only:
+                    raise KeyError(f'No cached response for {key} in replay-only mode')
+                return None
+
+            self.hits += 1
+            self._clock += 1
+            self._touched[key] = self._clock
+
+            return row[0]
+
+    def put(self, key: str, content: str) -> None:
+        with self._lock:
+            self._write_touched()
+            self._clock += 1
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses (key, content, last_used) VALUES (?, ?, ?)',
+                (key, content, self._clock)
+            )
+            if self.max_entries is not None:
+                self._connection.execute(
+                    'DELETE FROM responses WHERE key IN '
+                    '(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touched()
+            self._connection.commit()
+            self._connection.close()
+
+    def _write_touched(self) -> None:
+        self._connection.executemany(
+            'UPDATE responses SET last_used = ? WHERE key = ?',
+            [(last_used, key) for key, last_used in self._touched.items()]
+        )
+        self._touched = {}
+
+def response_key(model_id: str, messages: List[Tuple[str, str]]) -> str:
+    '''
+    Cache key of a conversation, a hash of the model identity and the (type, content) of every message.
+    '''
+    digest = hashlib.sha256(model_id.encode())
+    for message_type, content in messages:
+        digest.update(json.dumps([message_type, content]).encode())
+
+    return digest.hexdigest()
\ No newline at end of file
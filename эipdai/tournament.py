@@ -1,12 +1,21 @@
+import copy
 import random
+import asyncio
+import itertools
+import contextlib
 import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor
+from .common import N_PLAYERS
 from .environment import IPDGame
 from .strategies import Strategy
-from typing import List, Dict
+from typing import Callable, List, Dict, Tuple
 
-def schedule_games_subset(n_players: int) -> List[List[int]]:
+def schedule_games_subset(n_players: int, rng: np.random.Generator=None) -> List[List[int]]:
 
-    players = np.random.permutation(n_players)
+    if rng is None:
+        players = np.random.permutation(n_players)
+    else:
+        players = rng.permutation(n_players)
 
     n_basic_games = n_players // 2
 
@@ -15,50 +24,481 @@ def schedule_games_subset(n_players: int) -> List[List[int]]:
         schedule.append([players[i * 2], players[i * 2 + 1]])
 
     if n_players % 2 == 1:
-        r = random.randint(0, n_players - 2)
+        r = random.randint(0, n_players - 2) if rng is None else int(rng.integers(0, n_players - 1))
         if r == players[-1]:
             r += 1
         schedule.append([players[-1], r])
 
     return schedule
 
+def schedule_games_all_seats(n_players: int, rng: np.random.Generator=None) -> List[List[int]]:
+    '''
+    Splits players into random triples so that every player takes part in at least one game,
+    the last triple is filled up with distinct random players.
+    '''
+    if n_players < N_PLAYERS:
+        raise ValueError(f'Games need {N_PLAYERS} distinct players, got {n_players}')
+
+    if rng is None:
+        players = list(np.random.permutation(n_players))
+    else:
+        players = list(rng.permutation(n_players))
+
+    schedule = [players[i:i + N_PLAYERS] for i in range(0, n_players, N_PLAYERS)]
+
+    while len(schedule[-1]) < N_PLAYERS:
+        r = random.randrange(n_players) if rng is None else int(rng.integers(n_players))
+        if r not in schedule[-1]:
+            schedule[-1].append(r)
+
+    return schedule
+
+def schedule_games_exhaustive(n_players: int) -> List[List[int]]:
+    '''
+    Lists every unordered triple of distinct players in both cyclic seat orders, (a, b, c) and (a, c, b),
+    so that every player faces each pair of opponents in both orders.
+    '''
+    if n_players < N_PLAYERS:
+        raise ValueError(f'Games need {N_PLAYERS} distinct players, got {n_players}')
+
+    return [
+        list(roster)
+        for a, b, c in itertools.combinations(range(n_players), N_PLAYERS)
+        for roster in [(a, b, c), (a, c, b)]
+    ]
+
+def seat_players(
+        players: List[Strategy],
+        roster: List[int]
+    ) -> List[Strategy]:
+    '''
+    Returns players of the roster, a player seated more than once is copied so that every seat has its own state.
+    '''
+    seated = []
+    for i in roster:
+        player = players[i]
+        seated.append(copy.copy(player) if any(player is other for other in seated) else player)
+
+    return seated
+
+def play_game(
+        environment: IPDGame,
+        players: List[Strategy],
+        options: dict=None,
+        per_round: bool=False,
+        min_end_round: int=None
+    ) -> np.ndarray:
+    '''
+    Plays a single game and returns returns per seat, or rewards of every round if per_round is set.
+    With min_end_round, returns are instead averaged over all end rounds from min_end_round to the end of the game.
+
+    If all players are deterministic, the game is fast-forwarded as soon as the last rounds of history 
+    and the states of all players repeat: the remaining rounds continue the cycle found.
+    Their observations then span only the longest memory_depth of the players.
+    '''
+    for player in players:
+        player.reset()
+
+    fast_forward = all(player.deterministic for player in players)
+    if fast_forward:
+        window = max([1] + [player.memory_depth for player in players])
+        seen = {}
+        # Deterministic players read only their memory_depth last rounds, long games need no full history buffers
+        options = {**(options or {}), 'observation_len': window}
+
+    observations = environment.reset_array(options=options)
+    rewards = [None] * len(players)
+    rewards_history = []
+
+    done = False
+    while not done:
+        if fast_forward:
+            configuration = (observations[0][:, -window:].tobytes(), tuple(player.state() for player in players))
+            if configuration in seen:
+                return _continue_cycle(
+                    np.array(rewards_history), seen[configuration], environment.end_round, per_round, min_end_round
+                )
+            seen[configuration] = len(rewards_history)
+
+        actions = [player.play(observations[i], rewards[i]) for i, player in enumerate(players)]
+
+        observations, rewards, done = environment.step_array(actions)
+
+        rewards_history.append(rewards)
+
+    rewards_history = np.array(rewards_history)
+
+    if min_end_round is not None:
+        return rewards_history.cumsum(axis=0)[min_end_round - 1:].mean(axis=0)
+
+    return rewards_history if per_round else rewards_history.sum(axis=0)
+
+def _continue_cycle(
+        rewards_history: np.ndarray,
+        cycle_start: int,
+        n_rounds: int,
+        per_round: bool,
+        min_end_round: int=None
+    ) -> np.ndarray:
+
+    cycle = rewards_history[cycle_start:]
+    n_remaining = n_rounds - len(rewards_history)
+
+    if min_end_round is not None:
+        returns = rewards_history.cumsum(axis=0)
+        # Games ending k rounds after the history return returns[-1] + cycle_returns(k)
+        first, last = max(min_end_round - len(rewards_history), 1), n_remaining
+        total = returns[min_end_round - 1:].sum(axis=0)
+        if last >= first:
+            total = (
+                total + (last - first + 1) * returns[-1] + 
+                _sum_cycle_returns(cycle, last + 1) - _sum_cycle_returns(cycle, first)
+            )
+
+        return total / (n_rounds - min_end_round + 1)
+
+    if per_round:
+        return np.concatenate([rewards_history, np.resize(cycle, [n_remaining, cycle.shape[1]])])
+
+    n_cycles, n_extra = divmod(n_remaining, len(cycle))
+
+    return rewards_history.sum(axis=0) + n_cycles * cycle.sum(axis=0) + cycle[:n_extra].sum(axis=0)
+
+def _sum_cycle_returns(cycle: np.ndarray, n_rounds: int) -> np.ndarray:
+    '''
+    Sums the returns of the first 0, 1, ..., n_rounds - 1 rounds of a repeated cycle in closed form.
+    '''
+    partial_returns = np.concatenate([np.zeros([1, cycle.shape[1]], dtype=cycle.dtype), cycle.cumsum(axis=0)])
+    cycle_return = partial_returns[-1]
+    n_cycles, n_extra = divmod(n_rounds, len(cycle))
+
+    return (
+        cycle_return * len(cycle) * (n_cycles * (n_cycles - 1) // 2) + n_cycles * partial_returns[:-1].sum(axis=0) +
+        n_extra * n_cycles * cycle_return + partial_returns[:n_extra].sum(axis=0)
+    )
+
+def expected_returns(
+        environment: IPDGame,
+        players: List[Strategy],
+        n_runs: int
+    ) -> np.ndarray:
+    '''
+    Estimates mean returns per seat over n_runs games. 
+
+    If all players are deterministic a single game of max_rounds is played instead and 
+    its returns are averaged over all possible end rounds.
+    '''
+    if all(player.deterministic for player in players):
+        return play_game(
+            environment, players, options={'n_rounds': environment.max_rounds}, min_end_round=environment.min_rounds
+        )
+
+    return np.mean([play_game(environment, players) for _ in range(n_runs)], axis=0)
+
+def spawn_seeds(seed: int, n_seeds: int) -> List[int]:
+    '''
+    Derives independent seeds from a master seed, fresh entropy is used if seed is None.
+    '''
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(n_seeds)]
+
+def _play_tournament_unit(
+        environment: IPDGame,
+        players: List[Strategy],
+        focal: int,
+        seed: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+
+    environment, rng = _unit_streams(environment, seed)
+
+    if focal is None:
+        n_samples = (len(players) + 1) // 2
+        schedule = [roster for _ in range(n_samples) for roster in schedule_games_all_seats(len(players), rng)]
+        n_scored_seats = N_PLAYERS
+    else:
+        schedule = [[focal] + roster for roster in schedule_games_subset(len(players), rng)]
+        n_scored_seats = 1
+
+    tallies = np.zeros(len(players))
+    n_games = np.zeros(len(players), dtype=int)
+
+    for roster in schedule:
+
+        returns = play_game(environment, _seat_seeded_players(players, roster, rng))
+
+        for seat in range(n_scored_seats):
+            tallies[roster[seat]] += returns[seat]
+            n_games[roster[seat]] += 1
+
+    return tallies, n_games
+
+def _play_triples_unit(
+        environment: IPDGame,
+        players: List[Strategy],
+        triples: List[List[int]],
+        n_runs: int,
+        seed: int
+    ) -> np.ndarray:
+
+    environment, rng = _unit_streams(environment, seed)
+
+    return np.array([
+        expected_returns(environment, _seat_seeded_players(players, roster, rng), n_runs) for roster in triples
+    ])
+
+def _unit_streams(environment: IPDGame, seed: int) -> Tuple[IPDGame, np.random.Generator]:
+    '''
+    Returns a copy of the environment with game lengths drawn from seed and a generator of the other random 
+    numbers of a work unit, so that units neither depend on nor change the random state of the process. 
+    Without a seed the environment and the global random state are used.
+    '''
+    if seed is None:
+        return environment, None
+
+    rng = np.random.default_rng(seed)
+    environment = copy.copy(environment)
+    environment.reset_array(seed=int(rng.integers(2**32)))
+
+    return environment, rng
+
+def _seat_seeded_players(
+        players: List[Strategy],
+        roster: List[int],
+        rng: np.random.Generator
+    ) -> List[Strategy]:
+    '''
+    Returns players of the roster, copies with random streams drawn from rng if given, see seat_players.
+    '''
+    if rng is None:
+        return seat_players(players, roster)
+
+    seated = [copy.copy(players[i]) for i in roster]
+    for player in seated:
+        player.seed(int(rng.integers(2**32)))
+
+    return seated
+
+def _map_units(
+        function: Callable,
+        units: tuple,
+        n_units: int,
+        n_workers: int,
+        executor: Executor
+    ) -> list:
+
+    if executor is not None:
+        return list(executor.map(function, *units))
+    elif n_workers is not None:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            return list(pool.map(function, *units, chunksize=max(1, n_units // (4 * n_workers))))
+    else:
+        return list(map(function, *units))
+
+def play_triples(
+        environment: IPDGame,
+        players: List[Strategy],
+        triples: List[List[int]],
+        n_runs: int,
+        n_workers: int=None,
+        executor: Executor=None,
+        seed: int=None,
+        chunk_size: int=64
+    ) -> np.ndarray:
+    '''
+    Estimates expected returns per seat of every triple, see expected_returns.
+
+    Args:
+        environment: game environment
+        players: participating strategies
+        triples: rosters to play
+        n_runs: number of games per triple with stochastic players
+        n_workers: number of worker processes, games are played in this process if not set
+        executor: executor to play games in, overrides n_workers
+        seed: master seed, every chunk of triples gets its own random stream derived from it
+        chunk_size: number of triples per work unit
+
+    Returns: array of shape (len(triples), N_PLAYERS)
+    '''
+    chunks = [triples[i:i + chunk_size] for i in range(0, len(triples), chunk_size)]
+
+    if seed is not None or executor is not None or n_workers is not None:
+        seeds = spawn_seeds(seed, len(chunks))
+    else:
+        seeds = [None] * len(chunks)
+
+    units = (itertools.repeat(environment), itertools.repeat(players), chunks, itertools.repeat(n_runs), seeds)
+
+    returns = _map_units(_play_triples_unit, units, len(chunks), n_workers, executor)
+
+    return np.concatenate(returns) if returns else np.zeros([0, N_PLAYERS])
+
 def run_tournament(
         environment: IPDGame,
         players: Strategy, 
-        n_runs: int
+        n_runs: int,
+        n_workers: int=None,
+        executor: Executor=None,
+        seed: int=None,
+        mode: str='focal'
     ) -> Dict[str, int]:
-    
-    results = []
+    '''
+    Plays n_runs random schedules for every player and ranks players by mean return per game.
 
-    for player in players:
+    Args:
+        environment: game environment
+        players: participating strategies
+        n_runs: number of schedules per player, or number of games per triple in 'exhaustive' mode
+        n_workers: number of worker processes, games are played in this process if not set
+        executor: executor to play games in, overrides n_workers
+        seed: master seed, every (player, run) unit draws schedules, game lengths and the random streams of 
+              stochastic players from its own seed derived from it, so that results do not depend on 
+              the number of workers and the global random state is left alone
+        mode: 'focal' scores only the scheduled player of every game, 
+              'all_seats' scores all participants and needs about a third of the games for the same number of samples,
+              'exhaustive' plays every triple of distinct players in both cyclic seat orders, 
+              once per order if all of them are deterministic
+
+    Returns: mean returns of players in ascending order
+    '''
+    if mode == 'exhaustive':
+        triples = schedule_games_exhaustive(len(players))
+        returns = play_triples(environment, players, triples, n_runs, n_workers, executor, seed)
+
+        tallies = np.zeros(len(players))
+        n_games = np.zeros(len(players), dtype=int)
+        for seat in range(N_PLAYERS):
+            roster = np.array(triples)[:, seat]
+            tallies += np.bincount(roster, returns[:, seat], minlength=len(players))
+            n_games += np.bincount(roster, minlength=len(players))
+
+        results = tallies / n_games
+
+        return {players[i].name : results[i] for i in np.argsort(results)}
+
+    if mode == 'focal':
+        focals = [focal for focal in range(len(players)) for run in range(n_runs)]
+    elif mode == 'all_seats':
+        focals = [None] * n_runs
+    else:
+        raise ValueError(f'Unknown tournament mode: {mode}')
+
+    if seed is not None or executor is not None or n_workers is not None:
+        seeds = spawn_seeds(seed, len(focals))
+    else:
+        seeds = [None] * len(focals)
+
+    units = (itertools.repeat(environment), itertools.repeat(players), focals, seeds)
+
+    tallies, n_games = map(sum, zip(*_map_units(_play_tournament_unit, units, len(focals), n_workers, executor)))
+
+    results = tallies / n_games
 
-        tally = 0
-        n_games = 0
+    return {players[i].name : results[i] for i in np.argsort(results)}
+
+async def aplay_game(
+        environment: IPDGame,
+        players: List[Strategy],
+        options: dict=None,
+        per_round: bool=False,
+        semaphore: asyncio.Semaphore=None
+    ) -> np.ndarray:
+    '''
+    Asynchronous play_game, the players of every round move concurrently through Strategy.aplay.
+
+    Args:
+        environment: game environment, not shared with other games played at the same time
+        players: players of the game, not shared with other games played at the same time
+        options: reset options of the environment
+        per_round: returns rewards of every round instead of returns
+        semaphore: held for the whole game, limits the number of games in progress at once
+    '''
+    async with semaphore or contextlib.nullcontext():
+        for player in players:
+            player.reset()
+
+        observations = environment.reset_array(options=options)
+        rewards = [None] * len(players)
+        rewards_history = []
+
+        done = False
+        while not done:
+            actions = await asyncio.gather(*[
+                player.aplay(observations[i], rewards[i]) for i, player in enumerate(players)
+            ])
+
+            observations, rewards, done = environment.step_array(actions)
+
+            rewards_history.append(rewards)
+
+    rewards_history = np.array(rewards_history)
+
+    return rewards_history if per_round else rewards_history.sum(axis=0)
+
+async def arun_tournament(
+        environment: IPDGame,
+        players: List[Strategy],
+        n_runs: int,
+        max_concurrency: int=16,
+        seed: int=None,
+        mode: str='focal'
+    ) -> Dict[str, float]:
+    '''
+    Asynchronous run_tournament for players waiting on external services such as LLMStrategy. 
+    Up to max_concurrency games are played concurrently in this process, every game on copies of the environment and players, 
+    so that the moves of many games interleave while their players wait.
 
-        for run in range(n_runs):
-            for roster in schedule_games_subset(len(players)):
+    Args:
+        environment: game environment
+        players: participating strategies
+        n_runs: number of schedules per player, or number of games per triple in 'exhaustive' mode
+        max_concurrency: maximum number of games in progress at once, game buffers and player states
+            are only set up when a game starts
+        seed: seeds schedules and game lengths, stochastic players draw from their own streams, see Strategy.seed
+        mode: see run_tournament, 'exhaustive' plays n_runs games of every triple in both seat orders
 
-                round_players = [player] + [players[i] for i in roster]
-                for player in round_players:
-                    player.reset()
+    Returns: mean returns of players in ascending order
+    '''
+    rng = np.random.default_rng(seed)
 
-                observations, infos = environment.reset()
-                rewards = {player_id: None for player_id in environment.possible_agents}
+    if mode == 'focal':
+        games = [
+            ([focal] + roster, 1) 
+            for focal in range(len(players)) 
+            for run in range(n_runs) 
+            for roster in schedule_games_subset(len(players), rng)
+        ]
+    elif mode == 'all_seats':
+        n_samples = (len(players) + 1) // 2
+        games = [
+            (roster, N_PLAYERS)
+            for _ in range(n_runs * n_samples)
+            for roster in schedule_games_all_seats(len(players), rng)
+        ]
+    elif mode == 'exhaustive':
+        games = [(roster, N_PLAYERS) for roster in schedule_games_exhaustive(len(players)) for run in range(n_runs)]
+    else:
+        raise ValueError(f'Unknown tournament mode: {mode}')
 
-                while True:
-                    actions = {
-                        agent_id : round_players[i].play(observations[agent_id], rewards[agent_id]) 
-                        for i, agent_id in enumerate(environment.possible_agents)
-                    }
+    n_rounds = rng.integers(environment.min_rounds, environment.max_rounds + 1, size=len(games))
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-                    observations, rewards, terminations, trunctations, infos = environment.step(actions)
+    returns = await asyncio.gather(*[
+        aplay_game(
+            copy.copy(environment), 
+            [copy.copy(players[i]) for i in roster], 
+            options={'n_rounds': int(n)}, 
+            semaphore=semaphore
+        )
+        for (roster, n_scored_seats), n in zip(games, n_rounds)
+    ])
 
-                    tally += rewards[environment.possible_agents[0]]
+    tallies = np.zeros(len(players))
+    n_games = np.zeros(len(players), dtype=int)
 
-                    if any(terminations.values()): break
+    for (roster, n_scored_seats), game_returns in zip(games, returns):
+        for seat in range(n_scored_seats):
+            tallies[roster[seat]] += game_returns[seat]
+            n_games[roster[seat]] += 1
 
-                n_games += 1
-        
-        results.append(tally / n_games)
+    results = tallies / n_games
 
     return {players[i].name : results[i] for i in np.argsort(results)}
\ No newline at end of file